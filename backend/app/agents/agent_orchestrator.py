@@ -1,5 +1,5 @@
 """Agent orchestrator for coordinating multiple agents."""
-from typing import Dict, Any, List, Optional
+from typing import AsyncIterator, Dict, Any, List, Optional
 from app.agents.base_agent import BaseAgent
 from app.agents.search_agent import SearchAgent
 from app.agents.recommendation_agent import RecommendationAgent
@@ -47,6 +47,25 @@ class AgentOrchestrator:
             self.logger.error(f"Error executing task '{task}': {str(e)}")
             return {"error": str(e), "task": task}
     
+    def stream(self, task: str, input_data: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream events from an agent that supports incremental output.
+        
+        Args:
+            task: Task name of a streaming-capable agent (e.g. support)
+            input_data: Input data for the task
+            context: Optional context from previous operations
+            
+        Returns:
+            Async iterator of event dictionaries
+        """
+        agent = self.agents.get(task.lower())
+        
+        if not agent or not hasattr(agent, "stream"):
+            raise ValueError(f"Task '{task}' does not support streaming")
+        
+        return agent.stream(input_data, context)
+    
     async def execute_workflow(self, workflow: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Execute a workflow of multiple agent tasks.
@@ -0,0 +1,189 @@
+"""Multi-source candidate generation for the recommendation agent."""
+from typing import Dict, List, Set, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, load_only
+from app.models.dataset import Dataset, Purchase, dataset_list_columns
+from app.agents.gemini_utils import GeminiClient, compute_similarity
+from app.agents.dataset_embeddings import DatasetEmbeddingCache
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.trending import trending_counters
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CandidateGenerator:
+    """
+    Builds a short, relevant candidate list before the expensive ranking step.
+
+    Candidates are pulled from several cheap sources, interleaved round-robin so
+    every source gets representation, de-duplicated and capped.
+    """
+
+    SOURCES = ("same_category", "co_purchase", "trending", "embedding")
+
+    def __init__(
+        self,
+        max_candidates: int = 20,
+        per_source_limit: int = 10,
+        embedding_pool_size: int = 30
+    ):
+        self.max_candidates = max_candidates
+        self.per_source_limit = per_source_limit
+        self.embedding_pool_size = embedding_pool_size
+        self.gemini = GeminiClient()
+        self._embedding_cache = DatasetEmbeddingCache("candidates", settings.DATASET_EMBEDDING_CACHE_MAX_ENTRIES)
+
+    async def generate(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        purchased: List[Dataset],
+        user_profile: str
+    ) -> List[Dataset]:
+        """
+        Return up to `max_candidates` datasets the user has not purchased.
+
+        Args:
+            db: Database session
+            user_id: ID of the user being recommended to
+            purchased: Datasets the user already owns
+            user_profile: Text profile used for embedding neighbours
+        """
+        stage_start = time.perf_counter()
+        exclude = {d.id for d in purchased}
+        categories = {d.category for d in purchased if d.category}
+
+        source_results: Dict[str, List[int]] = {}
+        for source in self.SOURCES:
+            with metrics.timer("recommendation.candidate_source_ms", source=source):
+                try:
+                    if source == "same_category":
+                        ids = await self._same_category_top_rated(db, categories, exclude)
+                    elif source == "co_purchase":
+                        ids = await self._co_purchase_neighbours(db, user_id, exclude)
+                    elif source == "trending":
+                        ids = self._trending(exclude)
+                    else:
+                        ids = await self._embedding_neighbours(db, user_profile, exclude)
+                except Exception as e:
+                    logger.warning(f"Candidate source '{source}' failed: {e}")
+                    metrics.incr("recommendation.candidate_source_errors", source=source)
+                    ids = []
+            source_results[source] = ids
+
+        merged, origins = self._merge(source_results)
+        for source in self.SOURCES:
+            metrics.incr("recommendation.candidate_source_calls", source=source)
+            hits = sum(1 for origin in origins.values() if origin == source)
+            if hits:
+                metrics.incr("recommendation.candidate_source_hits", hits, source=source)
+
+        datasets = []
+        if merged:
+            result = await db.execute(select(Dataset).options(load_only(*dataset_list_columns())).where(
+                Dataset.id.in_(merged),
+                Dataset.is_active == True
+            ))
+            by_id = {d.id: d for d in result.scalars().all()}
+            datasets = [by_id[dataset_id] for dataset_id in merged if dataset_id in by_id]
+
+        metrics.observe(
+            "recommendation.stage_ms",
+            (time.perf_counter() - stage_start) * 1000,
+            stage="candidate_generation"
+        )
+        metrics.observe("recommendation.candidate_count", len(datasets))
+        return datasets
+
+    def _merge(self, source_results: Dict[str, List[int]]) -> Tuple[List[int], Dict[int, str]]:
+        """Interleave source lists round-robin, keeping the first source that produced an ID."""
+        merged: List[int] = []
+        origins: Dict[int, str] = {}
+        depth = max((len(ids) for ids in source_results.values()), default=0)
+
+        for position in range(depth):
+            for source in self.SOURCES:
+                ids = source_results.get(source, [])
+                if position >= len(ids):
+                    continue
+                dataset_id = ids[position]
+                if dataset_id in origins:
+                    continue
+                origins[dataset_id] = source
+                merged.append(dataset_id)
+                if len(merged) >= self.max_candidates:
+                    return merged, origins
+        return merged, origins
+
+    async def _same_category_top_rated(self, db: AsyncSession, categories: Set[str], exclude: Set[int]) -> List[int]:
+        """Top-rated active datasets in the categories the user already buys from."""
+        if not categories:
+            return []
+        result = await db.execute(select(Dataset.id).where(
+            Dataset.is_active == True,
+            Dataset.category.in_(categories),
+            Dataset.id.notin_(exclude)
+        ).order_by(
+            Dataset.rating.desc(),
+            Dataset.download_count.desc()
+        ).limit(self.per_source_limit))
+        return list(result.scalars().all())
+
+    async def _co_purchase_neighbours(self, db: AsyncSession, user_id: int, exclude: Set[int]) -> List[int]:
+        """Datasets most often bought by other users who bought the same datasets."""
+        if not exclude:
+            return []
+        other = aliased(Purchase)
+        co_count = func.count(other.id).label("co_count")
+        result = await db.execute(select(other.dataset_id, co_count).join(
+            Purchase, Purchase.buyer_id == other.buyer_id
+        ).where(
+            Purchase.dataset_id.in_(exclude),
+            Purchase.status == "completed",
+            Purchase.buyer_id != user_id,
+            other.status == "completed",
+            other.dataset_id.notin_(exclude)
+        ).group_by(other.dataset_id).order_by(co_count.desc()).limit(self.per_source_limit))
+        return [row.dataset_id for row in result.all()]
+
+    def _trending(self, exclude: Set[int]) -> List[int]:
+        """Datasets with the highest time-decayed view and purchase scores."""
+        return trending_counters.top(self.per_source_limit, exclude=exclude)
+
+    async def _embedding_neighbours(self, db: AsyncSession, user_profile: str, exclude: Set[int]) -> List[int]:
+        """Datasets whose Gemini embedding is closest to the user's profile."""
+        if not user_profile:
+            return []
+        query = select(Dataset).options(load_only(*dataset_list_columns())).where(Dataset.is_active == True)
+        if exclude:
+            query = query.where(Dataset.id.notin_(exclude))
+        result = await db.execute(query.order_by(Dataset.rating.desc()).limit(self.embedding_pool_size))
+        pool = result.scalars().all()
+        if not pool:
+            return []
+
+        texts = [
+            f"{dataset.title}. Category: {dataset.category}. Tags: {', '.join(dataset.tags or [])}"
+            for dataset in pool
+        ]
+        # A failure cancels the other call instead of leaving it to spend quota
+        async with asyncio.TaskGroup() as group:
+            profile_task = group.create_task(
+                self.gemini.agenerate_embedding(user_profile, priority="recommendation")
+            )
+            embeddings_task = group.create_task(self._embedding_cache.embed_many(
+                self.gemini, [dataset.id for dataset in pool], texts, priority="recommendation"
+            ))
+        profile_embedding = profile_task.result()
+        scored = [
+            (dataset.id, compute_similarity(profile_embedding, embedding))
+            for dataset, embedding in zip(pool, embeddings_task.result())
+        ]
+
+        scored.sort(key=lambda x: x[1], reverse=True)
+        return [dataset_id for dataset_id, _ in scored[:self.per_source_limit]]
@@ -0,0 +1,120 @@
+"""Circuit breaker for calls to an external provider."""
+from collections import deque
+from contextlib import contextmanager
+from typing import Tuple, Type
+from app.core.metrics import metrics
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised immediately when the breaker is open."""
+    pass
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker with closed, open and half-open states.
+
+    While closed, outcomes of the last `window_size` calls are tracked and the
+    breaker opens once at least `min_calls` have been seen and the failure rate
+    reaches `failure_rate_threshold`. While open, calls fail immediately with
+    `CircuitOpenError` until `open_seconds` have passed; then up to
+    `half_open_max_calls` trial calls are let through. A successful trial
+    closes the breaker, a failed one re-opens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float,
+        min_calls: int,
+        window_size: int,
+        open_seconds: float,
+        half_open_max_calls: int = 1,
+        ignore_exceptions: Tuple[Type[BaseException], ...] = ()
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.ignore_exceptions = ignore_exceptions
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._trial_calls = 0
+        metrics.set_gauge("gemini.breaker_state", _STATE_CODES[CLOSED], breaker=name)
+
+    def _transition(self, state: str):
+        logger.warning(f"Circuit breaker '{self.name}' {self.state} -> {state}")
+        self.state = state
+        metrics.incr("gemini.breaker_transitions", breaker=self.name, to=state)
+        metrics.set_gauge("gemini.breaker_state", _STATE_CODES[state], breaker=self.name)
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        elif state == CLOSED:
+            self._outcomes.clear()
+        self._trial_calls = 0
+
+    def before_call(self):
+        """Admit a call or raise `CircuitOpenError`."""
+        if self.state == CLOSED:
+            return
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                metrics.incr("gemini.breaker_short_circuits", breaker=self.name)
+                raise CircuitOpenError(f"Circuit '{self.name}' is open")
+            self._transition(HALF_OPEN)
+        if self._trial_calls >= self.half_open_max_calls:
+            metrics.incr("gemini.breaker_short_circuits", breaker=self.name)
+            raise CircuitOpenError(f"Circuit '{self.name}' is half-open")
+        self._trial_calls += 1
+
+    def record_success(self):
+        if self.state == HALF_OPEN:
+            self._transition(CLOSED)
+        else:
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        if self.state == HALF_OPEN:
+            self._transition(OPEN)
+            return
+        self._outcomes.append(False)
+        if len(self._outcomes) >= self.min_calls:
+            failures = sum(1 for ok in self._outcomes if not ok)
+            if failures / len(self._outcomes) >= self.failure_rate_threshold:
+                self._transition(OPEN)
+
+    def _record_neutral(self):
+        """A call that ended without telling us anything about provider health."""
+        if self.state == HALF_OPEN and self._trial_calls > 0:
+            self._trial_calls -= 1
+
+    @contextmanager
+    def protect(self):
+        """Guard a block: raises immediately when open and records the block's outcome."""
+        self.before_call()
+        try:
+            yield
+        except self.ignore_exceptions:
+            self._record_neutral()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Cancellation and the like
+            self._record_neutral()
+            raise
+        else:
+            self.record_success()
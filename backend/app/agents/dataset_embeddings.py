@@ -0,0 +1,56 @@
+"""Bounded per-worker cache of dataset embeddings."""
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+from app.core.metrics import metrics
+import hashlib
+import threading
+
+
+class DatasetEmbeddingCache:
+    """
+    LRU of dataset embeddings keyed on the dataset id.
+
+    The hash of the text that was embedded is stored with the vector, so an
+    edit to the embedded fields invalidates the entry while counter updates
+    that only touch `updated_at` do not. At most `max_entries` vectors are kept.
+    """
+
+    def __init__(self, name: str, max_entries: int):
+        self.name = name
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # dataset id -> (text hash, embedding)
+        self._entries: "OrderedDict[int, Tuple[bytes, List[float]]]" = OrderedDict()
+
+    @staticmethod
+    def _digest(text: str) -> bytes:
+        return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+    def get(self, dataset_id: int, text: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(dataset_id)
+            if entry is None or entry[0] != self._digest(text):
+                metrics.incr("dataset_embeddings.misses", cache=self.name)
+                return None
+            self._entries.move_to_end(dataset_id)
+        metrics.incr("dataset_embeddings.hits", cache=self.name)
+        return entry[1]
+
+    def put(self, dataset_id: int, text: str, embedding: List[float]):
+        with self._lock:
+            self._entries.pop(dataset_id, None)
+            self._entries[dataset_id] = (self._digest(text), embedding)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            metrics.set_gauge("dataset_embeddings.entries", len(self._entries), cache=self.name)
+
+    async def embed_many(self, gemini, dataset_ids: Sequence[int], texts: Sequence[str], priority: str) -> List[List[float]]:
+        """Embeddings for the datasets, fetching the uncached ones in batched Gemini calls."""
+        embeddings = [self.get(dataset_id, text) for dataset_id, text in zip(dataset_ids, texts)]
+        missing = [n for n, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            fetched = await gemini.agenerate_embeddings([texts[n] for n in missing], priority=priority)
+            for n, embedding in zip(missing, fetched):
+                embeddings[n] = embedding
+                self.put(dataset_ids[n], texts[n], embedding)
+        return embeddings
@@ -0,0 +1,42 @@
+"""Local fake of the Gemini model for development and latency measurements."""
+from typing import Iterator, List
+import time
+
+
+class _FakeChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _FakeResponse:
+    def __init__(self, chunks: List[str]):
+        self.text = "".join(chunks)
+
+
+class FakeGenerativeModel:
+    """
+    Mimics `genai.GenerativeModel.generate_content` with a fixed per-token delay.
+
+    Useful for comparing time to first byte between the blocking and streaming
+    support endpoints without a Gemini API key.
+    """
+
+    ANSWER = (
+        "Thanks for reaching out! You can browse and search datasets, buy them with your "
+        "account balance, and download anything you own from the My Purchases page. "
+        "Let us know if there is anything else we can help with."
+    )
+
+    def __init__(self, token_latency_ms: float):
+        self.token_latency = token_latency_ms / 1000.0
+
+    def _tokens(self) -> Iterator[str]:
+        words = self.ANSWER.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.token_latency)
+            yield word if i == len(words) - 1 else word + " "
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        if stream:
+            return (_FakeChunk(token) for token in self._tokens())
+        return _FakeResponse(list(self._tokens()))
@@ -0,0 +1,153 @@
+"""FAQ knowledge base with a single-pass Aho-Corasick keyword matcher."""
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.core.metrics import metrics
+import asyncio
+import logging
+import os
+import threading
+import yaml
+
+logger = logging.getLogger(__name__)
+
+
+class AhoCorasick:
+    """Automaton that finds every occurrence of a set of keywords in one pass over the text."""
+
+    def __init__(self, keywords: List[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+
+        for keyword in keywords:
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(keyword)
+
+        # Breadth-first construction of failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Yield (start_index, keyword) for every keyword occurrence in `text`."""
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for keyword in self._output[state]:
+                yield index - len(keyword) + 1, keyword
+
+
+class FAQEntry:
+    """One FAQ answer and the keywords that trigger it."""
+
+    def __init__(self, entry_id: str, answer: str, keywords: List[str]):
+        self.id = entry_id
+        self.answer = answer
+        self.keywords = keywords
+
+
+class FAQKnowledgeBase:
+    """
+    FAQ entries loaded from YAML and compiled into an Aho-Corasick automaton.
+
+    Matching is a single pass over the query. Each entry scores the summed length
+    of the distinct keywords it matched, so an entry hit by several keywords
+    outranks one hit by a single short keyword. Keywords must start on a word
+    boundary ("format" does not match inside "information"). Matching only
+    reads the compiled state; `reload_async` re-reads the file off the event
+    loop when its modification time changes and is run as a periodic task.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.version = 0
+        self._lock = threading.Lock()
+        self._entries: List[FAQEntry] = []
+        self._keyword_entries: Dict[str, List[int]] = {}
+        self._automaton = AhoCorasick([])
+        self._mtime: Optional[float] = None
+        self._load()
+
+    def _load(self):
+        mtime = os.path.getmtime(self.path)
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+
+        entries = []
+        keyword_entries: Dict[str, List[int]] = {}
+        for item in data.get("entries", []):
+            keywords = [k.lower() for k in item.get("keywords", []) if k]
+            entry = FAQEntry(str(item["id"]), item["answer"], keywords)
+            for keyword in keywords:
+                keyword_entries.setdefault(keyword, []).append(len(entries))
+            entries.append(entry)
+
+        automaton = AhoCorasick(list(keyword_entries))
+        with self._lock:
+            self._entries = entries
+            self._keyword_entries = keyword_entries
+            self._automaton = automaton
+            self._mtime = mtime
+            self.version += 1
+        metrics.set_gauge("faq.entries", len(entries))
+        metrics.set_gauge("faq.keywords", len(keyword_entries))
+        logger.info(f"Loaded {len(entries)} FAQ entries ({len(keyword_entries)} keywords) from {self.path}")
+
+    def reload_if_changed(self):
+        """Reload the file if it changed; keep serving the old entries if it is invalid."""
+        try:
+            if os.path.getmtime(self.path) != self._mtime:
+                self._load()
+                metrics.incr("faq.reloads")
+        except Exception as e:
+            logger.error(f"FAQ reload from {self.path} failed: {e}")
+
+    async def reload_async(self):
+        # stat, YAML parsing and the automaton build all stay off the event loop
+        await asyncio.to_thread(self.reload_if_changed)
+
+    def match(self, query: str) -> Optional[FAQEntry]:
+        """Return the best-scoring entry for a lower-cased query, if any keyword matches."""
+        with self._lock:
+            automaton = self._automaton
+            keyword_entries = self._keyword_entries
+            entries = self._entries
+
+        matched = set()
+        for start, keyword in automaton.iter_matches(query):
+            if start == 0 or not query[start - 1].isalnum():
+                matched.add(keyword)
+        if not matched:
+            return None
+
+        scores: Dict[int, int] = {}
+        for keyword in matched:
+            for index in keyword_entries[keyword]:
+                scores[index] = scores.get(index, 0) + len(keyword)
+        # Ties go to the entry listed first in the file
+        best = max(scores, key=lambda index: (scores[index], -index))
+        return entries[best]
+
+    def entries(self) -> List[FAQEntry]:
+        return list(self._entries)
+
+    def topics(self) -> List[str]:
+        return [entry.id for entry in self._entries]
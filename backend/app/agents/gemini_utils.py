@@ -1,8 +1,16 @@
 """Gemini AI utilities for agent operations."""
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Any, Optional, Tuple
 import google.generativeai as genai
 from app.core.config import settings
+from app.agents.llm_cache import LLMResponseCache
+from app.agents.llm_governor import LLMGovernor, GovernorRejected, DEFAULT_PRIORITY
+from app.agents.circuit_breaker import CircuitBreaker
+from app.agents.fake_llm import FakeGenerativeModel
+from app.core.metrics import metrics
 import os
 
 logger = logging.getLogger(__name__)
@@ -10,25 +18,84 @@ logger = logging.getLogger(__name__)
 # Configure Gemini API
 GEMINI_API_KEY = settings.GEMINI_API_KEY or os.getenv("GEMINI_API_KEY", "")
 
-if GEMINI_API_KEY:
+if settings.LLM_FAKE_PROVIDER:
+    logger.warning("LLM_FAKE_PROVIDER enabled. Text generation uses a local fake model.")
+elif GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
     logger.info("Gemini API configured successfully")
 else:
     logger.warning("GEMINI_API_KEY not set. Gemini features will use fallback responses.")
 
+# Bounded pool for blocking SDK calls so they never run on the event loop
+_executor = ThreadPoolExecutor(max_workers=settings.GEMINI_MAX_WORKERS, thread_name_prefix="gemini")
+
+DEFAULT_MODEL = 'gemini-2.5-flash'
+EMBED_BATCH_SIZE = 100  # Provider limit on texts per embed_content call
+
+_response_cache = None
+if settings.LLM_CACHE_PATH:
+    _response_cache = LLMResponseCache(
+        path=settings.LLM_CACHE_PATH,
+        max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+        family_ttls=settings.LLM_CACHE_TTL_SECONDS,
+        default_ttl=settings.LLM_CACHE_DEFAULT_TTL_SECONDS
+    )
+
+# Text generation and embeddings have separate provider quotas
+_text_governor = LLMGovernor(
+    name="text",
+    requests_per_minute=settings.GEMINI_REQUESTS_PER_MINUTE,
+    burst=settings.GEMINI_BURST,
+    max_in_flight=settings.GEMINI_MAX_IN_FLIGHT,
+    max_queue=settings.GEMINI_MAX_QUEUE,
+    queue_timeout=settings.GEMINI_QUEUE_TIMEOUT_SECONDS
+)
+_embedding_governor = LLMGovernor(
+    name="embedding",
+    requests_per_minute=settings.GEMINI_EMBED_REQUESTS_PER_MINUTE,
+    burst=settings.GEMINI_EMBED_BURST,
+    max_in_flight=settings.GEMINI_MAX_IN_FLIGHT,
+    max_queue=settings.GEMINI_MAX_QUEUE,
+    queue_timeout=settings.GEMINI_QUEUE_TIMEOUT_SECONDS
+)
+
+
+def _make_breaker(name: str) -> CircuitBreaker:
+    # Governor rejections are our own back-pressure, not provider failures
+    return CircuitBreaker(
+        name=name,
+        failure_rate_threshold=settings.GEMINI_BREAKER_FAILURE_RATE,
+        min_calls=settings.GEMINI_BREAKER_MIN_CALLS,
+        window_size=settings.GEMINI_BREAKER_WINDOW,
+        open_seconds=settings.GEMINI_BREAKER_OPEN_SECONDS,
+        half_open_max_calls=settings.GEMINI_BREAKER_HALF_OPEN_CALLS,
+        ignore_exceptions=(GovernorRejected,)
+    )
+
+
+_text_breaker = _make_breaker("text")
+_embedding_breaker = _make_breaker("embedding")
+
 
 class GeminiClient:
     """Singleton client for Google Gemini API."""
     _instance = None
     _model = None
+    # In-flight async calls keyed on (kind, *arguments); identical concurrent calls share one future
+    _inflight: Dict[Tuple, "asyncio.Future"] = {}
     
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(GeminiClient, cls).__new__(cls)
         return cls._instance
     
-    def get_model(self, model_name: str = 'gemini-2.5-flash'):
+    def get_model(self, model_name: str = DEFAULT_MODEL):
         """Get or create Gemini model instance."""
+        if settings.LLM_FAKE_PROVIDER:
+            if self._model is None:
+                self._model = FakeGenerativeModel(settings.LLM_FAKE_TOKEN_LATENCY_MS)
+            return self._model
+        
         if not GEMINI_API_KEY:
             raise ValueError("GEMINI_API_KEY not configured")
             
@@ -37,18 +104,31 @@ class GeminiClient:
             self._model = genai.GenerativeModel(model_name)
         return self._model
     
-    def generate_text(self, prompt: str, max_tokens: int = 500) -> str:
+    def generate_text(self, prompt: str, max_tokens: int = 500, cache_family: Optional[str] = None) -> str:
         """
         Generate text using Gemini.
         
         Args:
             prompt: Input prompt
             max_tokens: Maximum tokens in response
+            cache_family: Prompt family for the persistent response cache; None skips caching
         
         Returns:
             Generated text
         """
-        if not GEMINI_API_KEY:
+        if cache_family and _response_cache:
+            cached = _response_cache.get(DEFAULT_MODEL, prompt, cache_family)
+            if cached is not None:
+                return cached
+        
+        text = self._generate_uncached(prompt)
+        if cache_family and _response_cache:
+            _response_cache.set(DEFAULT_MODEL, prompt, cache_family, text)
+        return text
+    
+    def _generate_uncached(self, prompt: str) -> str:
+        """Call the Gemini model directly, bypassing the response cache."""
+        if not GEMINI_API_KEY and not settings.LLM_FAKE_PROVIDER:
             raise ValueError("GEMINI_API_KEY not configured")
             
         try:
@@ -86,6 +166,175 @@ class GeminiClient:
         except Exception as e:
             logger.error(f"Gemini embedding failed: {e}")
             raise
+    
+    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed up to EMBED_BATCH_SIZE texts in one request."""
+        if not GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY not configured")
+            
+        try:
+            result = genai.embed_content(
+                model="models/embedding-001",
+                content=texts,
+                task_type="retrieval_document"
+            )
+            return result['embedding']
+        except Exception as e:
+            logger.error(f"Gemini batch embedding failed: {e}")
+            raise
+    
+    async def evict_cached(self, prompt: str):
+        """Remove a cached response so the next call goes to Gemini again."""
+        if _response_cache:
+            await asyncio.to_thread(_response_cache.delete, DEFAULT_MODEL, prompt)
+    
+    async def _single_flight(self, key: Tuple, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `call` once for all concurrent callers with the same key.
+        
+        Waiters are shielded so one caller being cancelled does not cancel the
+        shared call for the others.
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            metrics.incr("gemini.coalesced_waiters", kind=key[0])
+            return await asyncio.shield(future)
+        
+        metrics.incr("gemini.calls", kind=key[0])
+        future = asyncio.ensure_future(call())
+        self._inflight[key] = future
+        metrics.set_gauge("gemini.inflight_calls", len(self._inflight))
+        
+        def _done(_):
+            self._inflight.pop(key, None)
+            metrics.set_gauge("gemini.inflight_calls", len(self._inflight))
+        
+        future.add_done_callback(_done)
+        return await asyncio.shield(future)
+    
+    async def agenerate_text(
+        self,
+        prompt: str,
+        max_tokens: int = 500,
+        cache_family: Optional[str] = None,
+        priority: str = DEFAULT_PRIORITY
+    ) -> str:
+        """
+        Async variant of `generate_text` that keeps the event loop free.
+        
+        Cache hits return without touching the rate limiter; misses wait for a
+        governor slot in the given priority class (see `llm_governor.PRIORITY_CLASSES`).
+        """
+        return await self._single_flight(
+            ("text", prompt, max_tokens, cache_family),
+            lambda: self._agenerate_text(prompt, cache_family, priority)
+        )
+    
+    async def _agenerate_text(self, prompt: str, cache_family: Optional[str], priority: str) -> str:
+        if cache_family and _response_cache:
+            cached = await asyncio.to_thread(_response_cache.get, DEFAULT_MODEL, prompt, cache_family)
+            if cached is not None:
+                return cached
+        
+        # An open breaker fails here, before queueing, so agents fall back immediately
+        with _text_breaker.protect():
+            async with _text_governor.slot(priority):
+                loop = asyncio.get_running_loop()
+                text = await loop.run_in_executor(_executor, self._generate_uncached, prompt)
+        
+        if cache_family and _response_cache:
+            await asyncio.to_thread(_response_cache.set, DEFAULT_MODEL, prompt, cache_family, text)
+        return text
+    
+    async def astream_text(
+        self,
+        prompt: str,
+        cache_family: Optional[str] = None,
+        priority: str = DEFAULT_PRIORITY
+    ) -> AsyncIterator[str]:
+        """
+        Stream generated text chunks as Gemini produces them.
+        
+        The blocking SDK iterator runs on the Gemini pool and hands chunks to the
+        event loop through a queue. A cached response is yielded as one chunk, and
+        a fully streamed response is written to the cache.
+        """
+        if cache_family and _response_cache:
+            cached = await asyncio.to_thread(_response_cache.get, DEFAULT_MODEL, prompt, cache_family)
+            if cached is not None:
+                yield cached
+                return
+        
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        # Set when the consumer goes away (e.g. the SSE client disconnected) so the thread stops reading
+        stop = threading.Event()
+        
+        def _produce():
+            try:
+                for chunk in self.get_model().generate_content(prompt, stream=True):
+                    if stop.is_set():
+                        metrics.incr("gemini.streams_abandoned")
+                        return
+                    if chunk.text:
+                        loop.call_soon_threadsafe(queue.put_nowait, chunk.text)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            except Exception as e:
+                logger.error(f"Gemini streaming failed: {e}")
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+        
+        parts = []
+        with _text_breaker.protect():
+            async with _text_governor.slot(priority):
+                producer = loop.run_in_executor(_executor, _produce)
+                try:
+                    while True:
+                        item = await queue.get()
+                        if item is done:
+                            break
+                        if isinstance(item, Exception):
+                            raise item
+                        parts.append(item)
+                        yield item
+                finally:
+                    stop.set()
+                    # Keep the slot until the pool thread has returned, so abandoned
+                    # streams stay inside the in-flight limit
+                    await asyncio.shield(producer)
+        
+        if cache_family and _response_cache:
+            await asyncio.to_thread(_response_cache.set, DEFAULT_MODEL, prompt, cache_family, "".join(parts))
+    
+    async def agenerate_embedding(self, text: str, priority: str = DEFAULT_PRIORITY) -> List[float]:
+        """Async variant of `generate_embedding` that keeps the event loop free."""
+        return await self._single_flight(
+            ("embedding", text),
+            lambda: self._agenerate_embedding(text, priority)
+        )
+    
+    async def _agenerate_embedding(self, text: str, priority: str) -> List[float]:
+        with _embedding_breaker.protect():
+            async with _embedding_governor.slot(priority):
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(_executor, self.generate_embedding, text)
+    
+    async def agenerate_embeddings(self, texts: List[str], priority: str = DEFAULT_PRIORITY) -> List[List[float]]:
+        """
+        Embed many texts with one governor slot per EMBED_BATCH_SIZE texts.
+        
+        Batches run one after another, so a large request holds a single slot
+        instead of flooding the governor queue with one call per text.
+        """
+        embeddings: List[List[float]] = []
+        loop = asyncio.get_running_loop()
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            batch = texts[start:start + EMBED_BATCH_SIZE]
+            with _embedding_breaker.protect():
+                async with _embedding_governor.slot(priority):
+                    embeddings.extend(await loop.run_in_executor(_executor, self.generate_embeddings, batch))
+        metrics.incr("gemini.batched_embeddings", len(texts))
+        return embeddings
 
 
 def compute_similarity(embedding1: List[float], embedding2: List[float]) -> float:
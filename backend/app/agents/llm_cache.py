@@ -0,0 +1,107 @@
+"""Persistent, disk-backed cache for LLM responses."""
+from typing import Dict, Optional
+from app.core.metrics import metrics
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """
+    SQLite-backed response cache keyed on model and prompt hash.
+
+    Each prompt family has its own TTL. The number of entries is capped and the
+    least recently used entries are evicted first. The file survives restarts, so
+    repeated prompts skip both the latency and the API quota of a Gemini call.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int,
+        family_ttls: Dict[str, float],
+        default_ttl: float
+    ):
+        self.max_entries = max_entries
+        self.family_ttls = family_ttls
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                family TEXT NOT NULL,
+                response TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_responses_last_access ON llm_responses (last_access)")
+        # Approximate entry count, kept up to date by this process and re-synced before evicting
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()
+
+    @staticmethod
+    def make_key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, model: str, prompt: str, family: str) -> Optional[str]:
+        """Return a fresh cached response, or None."""
+        key = self.make_key(model, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, expires_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                metrics.incr("llm_cache.misses", family=family)
+                return None
+            self._conn.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key))
+        metrics.incr("llm_cache.hits", family=family)
+        return row[0]
+
+    def set(self, model: str, prompt: str, family: str, response: str):
+        """Store a response and evict least recently used entries over the cap."""
+        key = self.make_key(model, prompt)
+        now = time.time()
+        ttl = self.family_ttls.get(family, self.default_ttl)
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, family, response, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, family, response, now + ttl, now)
+            )
+            if exists is None:
+                self._count += 1
+            if self._count > self.max_entries:
+                self._evict(now)
+
+    def delete(self, model: str, prompt: str):
+        """Drop a cached response, e.g. one the caller could not parse."""
+        key = self.make_key(model, prompt)
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,)).rowcount
+            self._count -= deleted
+
+    def _evict(self, now: float):
+        """Drop expired entries, then the least recently used ones over the cap."""
+        self._conn.execute("DELETE FROM llm_responses WHERE expires_at <= ?", (now,))
+        # Other workers share the file, so recount rather than trust the local estimate
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM llm_responses WHERE key IN "
+                "(SELECT key FROM llm_responses ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+            metrics.incr("llm_cache.evictions", overflow)
+        self._count = min(count, self.max_entries)
+        metrics.set_gauge("llm_cache.entries", self._count)
@@ -0,0 +1,159 @@
+"""Rate limiting and concurrency control for LLM provider calls."""
+from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple
+from app.core.metrics import metrics
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Lower value is served first
+PRIORITY_CLASSES = {
+    "search": 0,
+    "support": 1,
+    "recommendation": 2,
+    "external_recommendation": 3,
+}
+DEFAULT_PRIORITY = "recommendation"
+
+
+class GovernorRejected(Exception):
+    """Raised when a call cannot be admitted (queue full or wait timed out)."""
+    pass
+
+
+class LLMGovernor:
+    """
+    Token-bucket rate limiter combined with a max-in-flight limit.
+
+    Callers that cannot start immediately wait in a bounded priority queue, so a
+    search is admitted before a queued external recommendation. A caller that
+    waits longer than `queue_timeout` is rejected instead of piling up.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float,
+        burst: int,
+        max_in_flight: int,
+        max_queue: int,
+        queue_timeout: float
+    ):
+        self.name = name
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._in_flight = 0
+        self._waiting = 0
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _try_start(self) -> bool:
+        """Take a token and an in-flight slot if both are available."""
+        if self._in_flight >= self.max_in_flight:
+            return False
+        self._refill()
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        self._in_flight += 1
+        return True
+
+    def _dispatch(self):
+        """Admit queued callers in priority order while capacity allows."""
+        while self._queue:
+            if self._queue[0][2].done():
+                heapq.heappop(self._queue)
+                continue
+            if not self._try_start():
+                if self._in_flight < self.max_in_flight:
+                    self._schedule_wakeup()
+                break
+            _, _, waiter = heapq.heappop(self._queue)
+            self._waiting -= 1
+            waiter.set_result(None)
+        self._report()
+
+    def _schedule_wakeup(self):
+        """Re-run dispatch once the next token has been refilled."""
+        if self._wakeup is not None or self.rate <= 0:
+            return
+        delay = max(0.0, (1 - self._tokens) / self.rate)
+
+        def _wake():
+            self._wakeup = None
+            self._dispatch()
+
+        self._wakeup = asyncio.get_running_loop().call_later(delay, _wake)
+
+    def _report(self):
+        metrics.set_gauge("gemini.governor_in_flight", self._in_flight, governor=self.name)
+        metrics.set_gauge("gemini.governor_queued", self._waiting, governor=self.name)
+
+    async def acquire(self, priority: str = DEFAULT_PRIORITY):
+        """Wait for permission to make one call."""
+        start = time.perf_counter()
+        if not self._queue and self._try_start():
+            metrics.observe("gemini.queue_wait_ms", 0.0, governor=self.name, priority=priority)
+            self._report()
+            return
+
+        if self._waiting >= self.max_queue:
+            metrics.incr("gemini.rejections", governor=self.name, priority=priority, reason="queue_full")
+            raise GovernorRejected(f"{self.name} queue is full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        rank = PRIORITY_CLASSES.get(priority, PRIORITY_CLASSES[DEFAULT_PRIORITY])
+        heapq.heappush(self._queue, (rank, next(self._seq), waiter))
+        self._waiting += 1
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._waiting -= 1
+            self._report()
+            metrics.incr("gemini.rejections", governor=self.name, priority=priority, reason="timeout")
+            raise GovernorRejected(f"Timed out waiting for {self.name} capacity")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Admitted just as we were cancelled; hand the slot back
+                self.release()
+            else:
+                self._waiting -= 1
+                self._report()
+            raise
+        finally:
+            metrics.observe(
+                "gemini.queue_wait_ms",
+                (time.perf_counter() - start) * 1000,
+                governor=self.name,
+                priority=priority
+            )
+
+    def release(self):
+        """Return an in-flight slot and admit the next waiter."""
+        self._in_flight -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: str = DEFAULT_PRIORITY):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
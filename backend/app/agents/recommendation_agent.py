@@ -1,9 +1,14 @@
 """Recommendation agent using Google Gemini for intelligent recommendations."""
 from typing import Dict, Any, List, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, selectinload
 from app.agents.base_agent import BaseAgent
-from app.models.dataset import Dataset, Purchase
+from app.models.dataset import Dataset, Purchase, dataset_list_columns
 from app.agents.gemini_utils import GeminiClient
+from app.agents.candidate_generation import CandidateGenerator
+from app.core.metrics import metrics
+from app.services.trending import trending_counters
 import logging
 import json
 
@@ -19,6 +24,7 @@ class RecommendationAgent(BaseAgent):
             description="Recommends datasets using Gemini AI analysis from local and online sources"
         )
         self.gemini = GeminiClient()
+        self.candidate_generator = CandidateGenerator()
     
     async def process(self, input_data: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
@@ -31,7 +37,7 @@ class RecommendationAgent(BaseAgent):
         Returns:
             Dictionary with 'recommendations' (list of local datasets) and 'external_recommendations' (list)
         """
-        db: Session = input_data.get("db")
+        db: AsyncSession = input_data.get("db")
         user_id: int = input_data.get("user_id")
         
         if not db:
@@ -43,22 +49,22 @@ class RecommendationAgent(BaseAgent):
         if user_id:
             # Get local recommendations
             try:
-                local_recommendations = self._gemini_recommendations(db, user_id)
+                local_recommendations = await self._gemini_recommendations(db, user_id)
                 self.log(f"Gemini local recommendations generated: {len(local_recommendations)} items")
             except Exception as e:
                 self.log(f"Gemini recommendation failed: {e}, using fallback", level="warning")
-                local_recommendations = self._content_based_recommendations(db, user_id)
+                local_recommendations = await self._content_based_recommendations(db, user_id)
             
             # Get external recommendations based on user interests
             try:
-                user_interests = self._extract_user_interests(db, user_id)
+                user_interests = await self._extract_user_interests(db, user_id)
                 if user_interests:
-                    external_recommendations = self._recommend_external_datasets(user_interests)
+                    external_recommendations = await self._recommend_external_datasets(user_interests)
                     self.log(f"Found {len(external_recommendations)} external recommendations via Gemini")
             except Exception as e:
                 self.log(f"External recommendations failed: {e}", level="warning")
         else:
-            local_recommendations = self._popular_datasets(db)
+            local_recommendations = await self._popular_datasets(db)
         
         return {
             "recommendations": local_recommendations[:10],
@@ -66,12 +72,21 @@ class RecommendationAgent(BaseAgent):
             "count": len(local_recommendations[:10])
         }
     
-    def _extract_user_interests(self, db: Session, user_id: int) -> str:
+    async def _get_user_purchases(self, db: AsyncSession, user_id: int) -> List[Purchase]:
+        """Load the user's completed purchases with their datasets eagerly loaded."""
+        result = await db.execute(
+            select(Purchase).options(
+                selectinload(Purchase.dataset).load_only(*dataset_list_columns())
+            ).where(
+                Purchase.buyer_id == user_id,
+                Purchase.status == "completed"
+            )
+        )
+        return result.scalars().all()
+    
+    async def _extract_user_interests(self, db: AsyncSession, user_id: int) -> str:
         """Extract user interests from purchase history."""
-        user_purchases = db.query(Purchase).filter(
-            Purchase.buyer_id == user_id,
-            Purchase.status == "completed"
-        ).all()
+        user_purchases = await self._get_user_purchases(db, user_id)
         
         if not user_purchases:
             # Default interests for new users to enable external recommendations
@@ -95,7 +110,7 @@ class RecommendationAgent(BaseAgent):
         
         return interests
     
-    def _recommend_external_datasets(self, user_interests: str) -> List[Dict[str, Any]]:
+    async def _recommend_external_datasets(self, user_interests: str) -> List[Dict[str, Any]]:
         """
         Use Gemini to recommend external datasets based on user interests.
         
@@ -131,7 +146,9 @@ IMPORTANT: Do NOT guess specific dataset URLs as they might be broken. ALWAYS pr
 Return ONLY the JSON array, no other text."""
 
         try:
-            response_text = self.gemini.generate_text(prompt, max_tokens=1200)
+            response_text = await self.gemini.agenerate_text(
+                prompt, max_tokens=1200, cache_family="recommend_external", priority="external_recommendation"
+            )
             
             # Extract JSON from response
             if "```json" in response_text:
@@ -146,6 +163,7 @@ Return ONLY the JSON array, no other text."""
             
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse Gemini response as JSON: {e}")
+            await self.gemini.evict_cached(prompt)
             return []
         except Exception as e:
             logger.error(f"External dataset recommendation failed: {e}")
@@ -171,32 +189,26 @@ Return ONLY the JSON array, no other text."""
                 }
             ]
     
-    def _gemini_recommendations(self, db: Session, user_id: int) -> List[Dataset]:
+    async def _gemini_recommendations(self, db: AsyncSession, user_id: int) -> List[Dataset]:
         """
         Use Gemini to analyze user preferences and recommend local datasets.
         
         This uses Gemini's reasoning capabilities to understand user preferences.
         """
         # Get user's purchase history
-        user_purchases = db.query(Purchase).filter(
-            Purchase.buyer_id == user_id,
-            Purchase.status == "completed"
-        ).all()
+        user_purchases = await self._get_user_purchases(db, user_id)
         
         if not user_purchases:
-            return self._popular_datasets(db)
+            return await self._popular_datasets(db)
         
         # Build user profile from purchases
         purchased_datasets = [p.dataset for p in user_purchases]
         user_profile = self._build_user_profile(purchased_datasets)
         
-        # Get all available datasets (not purchased)
-        available_datasets = db.query(Dataset).filter(
-            Dataset.is_active == True,
-            Dataset.id.notin_([p.dataset_id for p in user_purchases])
-        ).limit(50).all()  # Limit to avoid too many API calls
+        # Only a short, relevant candidate list goes to the expensive ranking step
+        candidates = await self.candidate_generator.generate(db, user_id, purchased_datasets, user_profile)
         
-        if not available_datasets:
+        if not candidates:
             return []
         
         # Use Gemini to rank datasets based on user profile
@@ -206,28 +218,24 @@ User's Purchase History:
 {user_profile}
 
 Available Datasets:
-{self._format_datasets_for_prompt(available_datasets)}
+{self._format_datasets_for_prompt(candidates)}
 
 Task: Recommend the top 10 datasets that best match the user's interests based on their purchase history.
 Return ONLY the dataset IDs as a comma-separated list (e.g., "5,12,3,8,15,22,1,9,17,11").
 """
         
         try:
-            response = self.gemini.generate_text(prompt, max_tokens=100)
+            with metrics.timer("recommendation.stage_ms", stage="ranking"):
+                response = await self.gemini.agenerate_text(prompt, max_tokens=100, priority="recommendation")
             recommended_ids = self._parse_recommendation_response(response)
             
-            # Fetch recommended datasets in order
-            recommendations = []
-            for dataset_id in recommended_ids:
-                dataset = db.query(Dataset).filter(Dataset.id == dataset_id).first()
-                if dataset:
-                    recommendations.append(dataset)
-            
-            return recommendations
+            # Keep Gemini's order, ignoring any IDs that were not offered as candidates
+            candidates_by_id = {d.id: d for d in candidates}
+            return [candidates_by_id[i] for i in recommended_ids if i in candidates_by_id]
             
         except Exception as e:
             logger.error(f"Gemini recommendation parsing failed: {e}")
-            return self._content_based_recommendations(db, user_id)
+            return await self._content_based_recommendations(db, user_id)
     
     def _build_user_profile(self, datasets: List[Dataset]) -> str:
         """Build a text profile of user's interests."""
@@ -258,15 +266,12 @@ Return ONLY the dataset IDs as a comma-separated list (e.g., "5,12,3,8,15,22,1,9
         numbers = re.findall(r'\d+', response)
         return [int(n) for n in numbers[:10]]
     
-    def _content_based_recommendations(self, db: Session, user_id: int) -> List[Dataset]:
+    async def _content_based_recommendations(self, db: AsyncSession, user_id: int) -> List[Dataset]:
         """Fallback: content-based filtering."""
-        user_purchases = db.query(Purchase).filter(
-            Purchase.buyer_id == user_id,
-            Purchase.status == "completed"
-        ).all()
+        user_purchases = await self._get_user_purchases(db, user_id)
         
         if not user_purchases:
-            return self._popular_datasets(db)
+            return await self._popular_datasets(db)
         
         # Extract categories
         purchased_categories = set()
@@ -275,26 +280,43 @@ Return ONLY the dataset IDs as a comma-separated list (e.g., "5,12,3,8,15,22,1,9
                 purchased_categories.add(purchase.dataset.category)
         
         # Find similar datasets
-        query = db.query(Dataset).filter(
+        query = select(Dataset).options(load_only(*dataset_list_columns())).where(
             Dataset.is_active == True,
             Dataset.id.notin_([p.dataset_id for p in user_purchases])
         )
         
         if purchased_categories:
-            query = query.filter(Dataset.category.in_(purchased_categories))
+            query = query.where(Dataset.category.in_(purchased_categories))
         
-        return query.order_by(
+        result = await db.execute(query.order_by(
             Dataset.rating.desc(),
             Dataset.download_count.desc()
-        ).limit(10).all()
+        ).limit(10))
+        return result.scalars().all()
     
-    def _popular_datasets(self, db: Session) -> List[Dataset]:
-        """Fallback: return popular datasets."""
-        return db.query(Dataset).filter(
-            Dataset.is_active == True
-        ).order_by(
-            (Dataset.rating * 0.5 + (Dataset.download_count / 100) * 0.5).desc()
-        ).limit(10).all()
+    async def _popular_datasets(self, db: AsyncSession) -> List[Dataset]:
+        """Fallback: serve the precomputed trending top-N, topped up by all-time popularity."""
+        limit = 10
+        trending_ids = trending_counters.top(limit)
+        datasets = []
+        if trending_ids:
+            result = await db.execute(select(Dataset).options(load_only(*dataset_list_columns())).where(
+                Dataset.id.in_(trending_ids),
+                Dataset.is_active == True
+            ))
+            by_id = {d.id: d for d in result.scalars().all()}
+            datasets = [by_id[i] for i in trending_ids if i in by_id]
+        
+        if len(datasets) < limit:
+            query = select(Dataset).options(load_only(*dataset_list_columns())).where(Dataset.is_active == True)
+            if datasets:
+                query = query.where(Dataset.id.notin_([d.id for d in datasets]))
+            result = await db.execute(query.order_by(
+                (Dataset.rating * 0.5 + (Dataset.download_count / 100) * 0.5).desc()
+            ).limit(limit - len(datasets)))
+            datasets += result.scalars().all()
+        
+        return datasets
     
     def get_capabilities(self) -> List[str]:
         return [
@@ -302,5 +324,6 @@ Return ONLY the dataset IDs as a comma-separated list (e.g., "5,12,3,8,15,22,1,9
             "external_dataset_recommendations",
             "user_preference_analysis",
             "content_based_filtering",
-            "popular_datasets"
+            "popular_datasets",
+            "trending_datasets"
         ]
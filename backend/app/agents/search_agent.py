@@ -1,10 +1,15 @@
 """Search agent using Google Gemini for semantic search and external dataset discovery."""
 from typing import Dict, Any, List, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 from app.agents.base_agent import BaseAgent
-from app.models.dataset import Dataset
+from app.models.dataset import Dataset, dataset_list_columns
 from app.schemas.dataset import DatasetSearch
 from app.agents.gemini_utils import GeminiClient, compute_similarity
+from app.agents.dataset_embeddings import DatasetEmbeddingCache
+from app.core.config import settings
+import asyncio
 import logging
 import json
 
@@ -20,6 +25,7 @@ class SearchAgent(BaseAgent):
             description="Searches datasets using Gemini AI embeddings and discovers external datasets"
         )
         self.gemini = GeminiClient()
+        self._embedding_cache = DatasetEmbeddingCache("search", settings.DATASET_EMBEDDING_CACHE_MAX_ENTRIES)
     
     async def process(self, input_data: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
@@ -32,21 +38,22 @@ class SearchAgent(BaseAgent):
         Returns:
             Dictionary with 'datasets' (list), 'external_datasets' (list), and 'total' (int)
         """
-        db: Session = input_data.get("db")
+        db: AsyncSession = input_data.get("db")
         search_params: DatasetSearch = input_data.get("search_params")
         
         if not db or not search_params:
             return {"error": "Missing required parameters", "datasets": [], "total": 0}
         
         # Search local database
-        query = db.query(Dataset).filter(Dataset.is_active == True)
+        query = select(Dataset).options(load_only(*dataset_list_columns())).where(Dataset.is_active == True)
         query = self._apply_filters(query, search_params)
-        all_datasets = query.all()
+        result = await db.execute(query)
+        all_datasets = result.scalars().all()
         
         # If there's a text query, use Gemini for semantic ranking
         if search_params.query and all_datasets:
             try:
-                ranked_datasets = self._gemini_semantic_ranking(search_params.query, all_datasets)
+                ranked_datasets = await self._gemini_semantic_ranking(search_params.query, all_datasets)
                 self.log(f"Gemini semantic search: ranked {len(ranked_datasets)} datasets")
             except Exception as e:
                 self.log(f"Gemini search failed: {e}, using fallback", level="warning")
@@ -58,7 +65,7 @@ class SearchAgent(BaseAgent):
         external_datasets = []
         if search_params.query:
             try:
-                external_datasets = self._search_external_datasets(search_params.query)
+                external_datasets = await self._search_external_datasets(search_params.query)
                 self.log(f"Found {len(external_datasets)} external datasets via Gemini")
             except Exception as e:
                 self.log(f"External search failed: {e}", level="warning")
@@ -76,7 +83,7 @@ class SearchAgent(BaseAgent):
             "page_size": search_params.page_size
         }
     
-    def _search_external_datasets(self, query: str) -> List[Dict[str, Any]]:
+    async def _search_external_datasets(self, query: str) -> List[Dict[str, Any]]:
         """
         Use Gemini to search for real datasets from online sources.
         
@@ -108,7 +115,9 @@ IMPORTANT: Do NOT guess specific dataset URLs as they might be broken. ALWAYS pr
 Return ONLY the JSON array, no other text."""
 
         try:
-            response_text = self.gemini.generate_text(prompt, max_tokens=1000)
+            response_text = await self.gemini.agenerate_text(
+                prompt, max_tokens=1000, cache_family="search_external", priority="search"
+            )
             
             # Extract JSON from response
             # Sometimes Gemini adds markdown code blocks
@@ -124,6 +133,7 @@ Return ONLY the JSON array, no other text."""
             
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse Gemini response as JSON: {e}")
+            await self.gemini.evict_cached(prompt)
             return []
         except Exception as e:
             logger.error(f"External search failed: {e}")
@@ -158,43 +168,54 @@ Return ONLY the JSON array, no other text."""
     def _apply_filters(self, query, search_params: DatasetSearch):
         """Apply category, tag, price, and rating filters."""
         if search_params.category:
-            query = query.filter(Dataset.category == search_params.category)
+            query = query.where(Dataset.category == search_params.category)
         
         if search_params.tags:
             for tag in search_params.tags:
-                query = query.filter(Dataset.tags.contains([tag]))
+                query = query.where(Dataset.tags.contains([tag]))
         
         if search_params.min_price is not None:
-            query = query.filter(Dataset.price >= search_params.min_price)
+            query = query.where(Dataset.price >= search_params.min_price)
         if search_params.max_price is not None:
-            query = query.filter(Dataset.price <= search_params.max_price)
+            query = query.where(Dataset.price <= search_params.max_price)
         
         if search_params.min_rating is not None:
-            query = query.filter(Dataset.rating >= search_params.min_rating)
+            query = query.where(Dataset.rating >= search_params.min_rating)
         
         return query
     
-    def _gemini_semantic_ranking(self, query_text: str, datasets: List[Dataset]) -> List[Dataset]:
+    async def _gemini_semantic_ranking(self, query_text: str, datasets: List[Dataset]) -> List[Dataset]:
         """
         Rank datasets using Gemini embeddings.
         
         Uses Google Gemini API to generate embeddings and compute semantic similarity.
         """
-        # Generate query embedding
-        query_embedding = self.gemini.generate_embedding(query_text)
-        
-        # Generate dataset embeddings and compute similarities
-        similarities = []
-        for dataset in datasets:
-            dataset_text = f"{dataset.title}. {dataset.description}. Category: {dataset.category}. Tags: {', '.join(dataset.tags or [])}"
-            dataset_embedding = self.gemini.generate_embedding(dataset_text)
-            similarity = compute_similarity(query_embedding, dataset_embedding)
-            similarities.append((dataset, similarity))
+        # Only the strongest matches by the traditional score are embedded; the rest follow in that order
+        ordered = self._traditional_sorting(datasets, "relevance")
+        limit = settings.SEARCH_SEMANTIC_MAX_DATASETS
+        datasets, remainder = ordered[:limit], ordered[limit:]
+        dataset_texts = [
+            f"{dataset.title}. {dataset.description}. Category: {dataset.category}. Tags: {', '.join(dataset.tags or [])}"
+            for dataset in datasets
+        ]
+        # Uncached dataset embeddings go out as one batched call; a failure cancels the other call
+        async with asyncio.TaskGroup() as group:
+            query_task = group.create_task(self.gemini.agenerate_embedding(query_text, priority="search"))
+            embeddings_task = group.create_task(self._embedding_cache.embed_many(
+                self.gemini, [dataset.id for dataset in datasets], dataset_texts, priority="search"
+            ))
+        query_embedding, dataset_embeddings = query_task.result(), embeddings_task.result()
+        
+        # Compute similarities
+        similarities = [
+            (dataset, compute_similarity(query_embedding, embedding))
+            for dataset, embedding in zip(datasets, dataset_embeddings)
+        ]
         
         # Sort by similarity (highest first)
         similarities.sort(key=lambda x: x[1], reverse=True)
         
-        return [dataset for dataset, _ in similarities]
+        return [dataset for dataset, _ in similarities] + remainder
     
     def _traditional_sorting(self, datasets: List[Dataset], sort_by: str) -> List[Dataset]:
         """Traditional sorting by price, rating, date, or relevance."""
@@ -0,0 +1,111 @@
+"""Semantic answer cache: reuse answers to questions that mean the same thing."""
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import numpy as np
+from app.core.metrics import metrics
+import time
+
+
+def _normalize(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector if norm == 0 else vector / norm
+
+
+class SemanticAnswerCache:
+    """
+    Bounded, TTL-limited cache of answers keyed on question embeddings.
+
+    Vectors are normalised on insert and kept as rows of numpy matrices, so a
+    lookup is one matrix-vector product over the pinned entries and one over
+    the dynamic slots. Pinned entries (pre-embedded FAQ answers) never expire
+    and are not evicted; dynamic entries are evicted least recently used first.
+    """
+
+    def __init__(self, name: str, threshold: float, max_entries: int, ttl_seconds: float):
+        self.name = name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._pinned: Optional[np.ndarray] = None
+        self._pinned_answers: List[Tuple[str, str]] = []
+        # Dynamic entries: one matrix row per slot, allocated on the first store
+        self._vectors: Optional[np.ndarray] = None
+        self._stored_at = np.full(max_entries, -np.inf)  # -inf marks a free slot
+        self._answers: List[Optional[Tuple[str, str, str]]] = [None] * max_entries  # (question, answer, source)
+        self._free = list(range(max_entries - 1, -1, -1))
+        # question -> slot, in least recently used order
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def pin(self, entries: List[Tuple[List[float], str, str]]):
+        """Replace the pinned entries with (embedding, answer, source) tuples."""
+        if not entries:
+            self._pinned, self._pinned_answers = None, []
+            return
+        self._pinned = np.vstack([_normalize(embedding) for embedding, _, _ in entries])
+        self._pinned_answers = [(answer, source) for _, answer, source in entries]
+
+    def _release(self, slot: int):
+        question = self._answers[slot][0]
+        del self._slots[question]
+        self._answers[slot] = None
+        self._stored_at[slot] = -np.inf
+        self._free.append(slot)
+
+    def lookup(self, embedding: List[float]) -> Optional[Tuple[str, str]]:
+        """Return (answer, source) of the most similar entry above the threshold."""
+        query = _normalize(embedding)
+        now = time.time()
+        best: Optional[Tuple[str, str]] = None
+        best_question: Optional[str] = None
+        best_score = self.threshold
+
+        if self._pinned is not None:
+            scores = self._pinned @ query
+            index = int(np.argmax(scores))
+            if scores[index] >= best_score:
+                best, best_score = self._pinned_answers[index], float(scores[index])
+
+        if self._vectors is not None and self._slots:
+            occupied = self._stored_at > -np.inf
+            live = self._stored_at >= now - self.ttl_seconds
+            for slot in np.flatnonzero(occupied & ~live):
+                self._release(int(slot))
+            if live.any():
+                scores = np.where(live, self._vectors @ query, -np.inf)
+                slot = int(np.argmax(scores))
+                if scores[slot] >= best_score:
+                    best_question, answer, source = self._answers[slot]
+                    best = (answer, source)
+
+        if best_question is not None:
+            self._slots.move_to_end(best_question)
+        if best is None:
+            self._misses += 1
+            metrics.incr("semantic_cache.misses", cache=self.name)
+        else:
+            self._hits += 1
+            metrics.incr("semantic_cache.hits", cache=self.name)
+        metrics.set_gauge("semantic_cache.hit_rate", self._hits / (self._hits + self._misses), cache=self.name)
+        metrics.set_gauge("semantic_cache.entries", len(self._slots), cache=self.name)
+        return best
+
+    def store(self, question: str, embedding: List[float], answer: str, source: str):
+        """Remember an answer, evicting the least recently used entry when full."""
+        vector = _normalize(embedding)
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+        slot = self._slots.get(question)
+        if slot is None:
+            if not self._free:
+                self._release(next(iter(self._slots.values())))
+                metrics.incr("semantic_cache.evictions", cache=self.name)
+            slot = self._free.pop()
+            self._slots[question] = slot
+        self._slots.move_to_end(question)
+        self._vectors[slot] = vector
+        self._stored_at[slot] = time.time()
+        self._answers[slot] = (question, answer, source)
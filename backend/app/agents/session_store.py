@@ -0,0 +1,104 @@
+"""Conversation state stores for multi-turn support sessions."""
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from app.core.metrics import metrics
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class InProcessSessionStore:
+    """
+    Bounded LRU of session states for a single worker.
+
+    Sessions idle for longer than `idle_ttl` seconds expire, and the least
+    recently used session is evicted when `max_sessions` is exceeded. States are
+    kept as JSON strings so their resident size is known exactly.
+    """
+
+    def __init__(self, max_sessions: int, idle_ttl: float):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        # session_id -> (serialised state, last active)
+        self._sessions: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._resident_bytes = 0
+
+    def _drop(self, session_id: str, reason: str):
+        payload, _ = self._sessions.pop(session_id)
+        self._resident_bytes -= len(payload)
+        metrics.incr("support_sessions.evictions", reason=reason)
+
+    def _expire_idle(self, now: float):
+        # The OrderedDict is in last-active order, so expired sessions are at the front
+        while self._sessions:
+            session_id, (_, last_active) = next(iter(self._sessions.items()))
+            if now - last_active <= self.idle_ttl:
+                break
+            self._drop(session_id, "idle")
+
+    def _report(self):
+        metrics.set_gauge("support_sessions.count", len(self._sessions))
+        metrics.set_gauge("support_sessions.resident_bytes", self._resident_bytes)
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        self._expire_idle(now)
+        entry = self._sessions.get(session_id)
+        self._report()
+        if entry is None:
+            return None
+        return json.loads(entry[0])
+
+    async def save(self, session_id: str, state: Dict[str, Any]):
+        now = time.time()
+        payload = json.dumps(state)
+        if session_id in self._sessions:
+            self._resident_bytes -= len(self._sessions.pop(session_id)[0])
+        self._sessions[session_id] = (payload, now)
+        self._resident_bytes += len(payload)
+        metrics.observe("support_sessions.session_bytes", len(payload))
+
+        self._expire_idle(now)
+        while len(self._sessions) > self.max_sessions:
+            self._drop(next(iter(self._sessions)), "lru")
+        self._report()
+
+
+class RedisSessionStore:
+    """
+    Session states shared by all workers through Redis.
+
+    Each session is one key whose expiry is refreshed on every save, so idle
+    sessions expire on their own. Requires the optional `redis` package.
+    """
+
+    KEY_PREFIX = "support_session:"
+
+    def __init__(self, url: str, idle_ttl: float):
+        import redis.asyncio as redis
+
+        self.idle_ttl = idle_ttl
+        self._client = redis.from_url(url)
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        payload = await self._client.get(self.KEY_PREFIX + session_id)
+        if payload is None:
+            return None
+        return json.loads(payload)
+
+    async def save(self, session_id: str, state: Dict[str, Any]):
+        payload = json.dumps(state)
+        await self._client.set(self.KEY_PREFIX + session_id, payload, ex=int(self.idle_ttl))
+        metrics.observe("support_sessions.session_bytes", len(payload))
+
+
+def create_session_store(redis_url: str, max_sessions: int, idle_ttl: float):
+    """Use Redis when a URL is configured and the client is installed, otherwise stay in-process."""
+    if redis_url:
+        try:
+            return RedisSessionStore(redis_url, idle_ttl)
+        except ImportError:
+            logger.warning("SUPPORT_SESSION_REDIS_URL is set but the redis package is not installed; using in-process sessions")
+    return InProcessSessionStore(max_sessions, idle_ttl)
@@ -1,15 +1,29 @@
 """Support agent using Google Gemini for conversational AI."""
-from typing import Dict, Any, Optional, List
+from typing import AsyncIterator, Dict, Any, Optional, List, Tuple
 from app.agents.base_agent import BaseAgent
 from app.agents.gemini_utils import GeminiClient
+from app.agents.semantic_cache import SemanticAnswerCache
+from app.agents.faq_matcher import FAQKnowledgeBase
+from app.agents.session_store import create_session_store
+from app.core.config import settings
+from app.core.metrics import metrics
+import asyncio
 import logging
+import time
+import uuid
+from itertools import islice
 
 logger = logging.getLogger(__name__)
 
+# Shared by every SupportAgent; reloaded by the "faq_reload" background task
+support_faq = FAQKnowledgeBase(settings.SUPPORT_FAQ_PATH)
+
 
 class SupportAgent(BaseAgent):
     """Agent for conversational support using Google Gemini."""
     
+    FALLBACK_RESPONSE = "I can help you with pricing, downloads, refunds, formats, and quality questions. What would you like to know?"
+    
     def __init__(self):
         super().__init__(
             name="SupportAgent",
@@ -17,75 +31,342 @@ class SupportAgent(BaseAgent):
         )
         self.gemini = GeminiClient()
         
-        # FAQ for quick responses
-        self.faq_responses = {
-            "pricing": "Dataset prices vary based on size, quality, and content. You can filter by price range in the search.",
-            "download": "After purchase, you can download your dataset from the 'My Purchases' section.",
-            "refund": "Refunds are available within 7 days of purchase if the dataset doesn't meet the description.",
-            "format": "We support multiple formats including CSV, JSON, Parquet, and more. Check the dataset details for specific format.",
-            "quality": "All datasets go through quality checks. Ratings and reviews help you make informed decisions.",
-        }
+        # FAQ knowledge base for instant responses, hot-reloaded from YAML
+        self.faq = support_faq
+        
+        # Answers to earlier questions, matched by embedding similarity
+        self.semantic_cache = SemanticAnswerCache(
+            name="support",
+            threshold=settings.SUPPORT_SEMANTIC_CACHE_THRESHOLD,
+            max_entries=settings.SUPPORT_SEMANTIC_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.SUPPORT_SEMANTIC_CACHE_TTL_SECONDS
+        )
+        self._faq_embedded_version = 0
+        self._faq_embed_task: Optional[asyncio.Task] = None
+        self._faq_embed_failures = 0
+        self._faq_embed_retry_at = 0.0
+        
+        # Per-session conversation state (recent turns plus a summary of older ones)
+        self.sessions = create_session_store(
+            settings.SUPPORT_SESSION_REDIS_URL,
+            max_sessions=settings.SUPPORT_SESSION_MAX_SESSIONS,
+            idle_ttl=settings.SUPPORT_SESSION_IDLE_SECONDS
+        )
+        # Background summaries in progress, at most one per session
+        self._compactions: Dict[str, asyncio.Task] = {}
     
     async def process(self, input_data: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Process user support queries using Gemini AI.
         
         Args:
-            input_data: Contains 'query' (str) - user's question
+            input_data: Contains 'query' (str) - user's question and optional
+                'session_id' (str) of the conversation it continues
             context: Optional context from other agents
             
         Returns:
-            Dictionary with 'response' (str) and 'suggestions' (list)
+            Dictionary with 'response' (str), 'suggestions' (list) and 'session_id' (str)
         """
         query: str = input_data.get("query", "").lower()
+        session_id: str = input_data.get("session_id") or uuid.uuid4().hex
         
         if not query:
             return {
                 "response": "How can I help you today?",
-                "suggestions": list(self.faq_responses.keys())
+                "suggestions": self._default_topics(),
+                "session_id": session_id
             }
         
+        state = await self._load_session(session_id)
+        
         # Check FAQ first for instant responses
         faq_response = self._check_faq(query)
         if faq_response:
             self.log("Answered using FAQ")
+            await self._record_turn(session_id, state, query, faq_response)
             return {
                 "response": faq_response,
                 "suggestions": self._get_related_topics(query),
-                "source": "faq"
+                "source": "faq",
+                "session_id": session_id
+            }
+        
+        # Reuse the answer to a semantically equivalent question; follow-ups
+        # depend on the conversation, so they always go to Gemini
+        embedding, cached = None, None
+        if not self._has_history(state):
+            embedding, cached = await self._semantic_lookup(query)
+        if cached:
+            answer, source = cached
+            self.log("Answered from semantic cache")
+            await self._record_turn(session_id, state, query, answer)
+            return {
+                "response": answer,
+                "suggestions": self._get_related_topics(query) if source == "faq" else [],
+                "source": source,
+                "session_id": session_id
             }
         
         # Use Gemini for complex queries
         try:
-            ai_response = self._generate_gemini_response(query)
+            ai_response = await self._generate_gemini_response(query, state)
+            if embedding is not None:
+                self.semantic_cache.store(query, embedding, ai_response, "semantic_cache")
             self.log("Generated Gemini AI response")
+            await self._record_turn(session_id, state, query, ai_response)
             return {
                 "response": ai_response,
                 "suggestions": [],
-                "source": "gemini"
+                "source": "gemini",
+                "session_id": session_id
             }
         except Exception as e:
             self.log(f"Gemini response failed: {e}, using generic fallback", level="warning")
             return {
-                "response": "I can help you with pricing, downloads, refunds, formats, and quality questions. What would you like to know?",
-                "suggestions": list(self.faq_responses.keys()),
-                "source": "fallback"
+                "response": self.FALLBACK_RESPONSE,
+                "suggestions": self._default_topics(),
+                "source": "fallback",
+                "session_id": session_id
             }
     
+    async def stream(self, input_data: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a support answer as it is generated.
+        
+        Args:
+            input_data: Contains 'query' (str) - user's question and optional
+                'session_id' (str) of the conversation it continues
+            context: Optional context from other agents
+            
+        Yields:
+            'token' events with a text chunk, then one 'done' event with 'source',
+            'suggestions' and 'session_id'
+        """
+        start = time.perf_counter()
+        query: str = input_data.get("query", "").lower()
+        session_id: str = input_data.get("session_id") or uuid.uuid4().hex
+        
+        if not query:
+            yield {"event": "token", "data": {"text": "How can I help you today?"}}
+            yield {"event": "done", "data": {"suggestions": self._default_topics(), "session_id": session_id}}
+            return
+        
+        state = await self._load_session(session_id)
+        
+        faq_response = self._check_faq(query)
+        if faq_response:
+            self.log("Answered using FAQ")
+            metrics.observe("support.first_token_ms", (time.perf_counter() - start) * 1000, source="faq")
+            yield {"event": "token", "data": {"text": faq_response}}
+            await self._record_turn(session_id, state, query, faq_response)
+            yield {"event": "done", "data": {
+                "source": "faq", "suggestions": self._get_related_topics(query), "session_id": session_id
+            }}
+            return
+        
+        embedding, cached = None, None
+        if not self._has_history(state):
+            embedding, cached = await self._semantic_lookup(query)
+        if cached:
+            answer, source = cached
+            self.log("Answered from semantic cache")
+            metrics.observe("support.first_token_ms", (time.perf_counter() - start) * 1000, source=source)
+            yield {"event": "token", "data": {"text": answer}}
+            await self._record_turn(session_id, state, query, answer)
+            suggestions = self._get_related_topics(query) if source == "faq" else []
+            yield {"event": "done", "data": {"source": source, "suggestions": suggestions, "session_id": session_id}}
+            return
+        
+        sent_any = False
+        chunks = []
+        try:
+            async for chunk in self.gemini.astream_text(
+                self._build_prompt(query, state), cache_family="support", priority="support"
+            ):
+                if not sent_any:
+                    metrics.observe("support.first_token_ms", (time.perf_counter() - start) * 1000, source="gemini")
+                    sent_any = True
+                chunks.append(chunk)
+                yield {"event": "token", "data": {"text": chunk}}
+            answer = "".join(chunks).strip()
+            if embedding is not None:
+                self.semantic_cache.store(query, embedding, answer, "semantic_cache")
+            self.log("Streamed Gemini AI response")
+            await self._record_turn(session_id, state, query, answer)
+            yield {"event": "done", "data": {"source": "gemini", "suggestions": [], "session_id": session_id}}
+        except Exception as e:
+            self.log(f"Gemini streaming failed: {e}, using generic fallback", level="warning")
+            if sent_any:
+                yield {"event": "error", "data": {"detail": "The answer was interrupted. Please try again."}}
+                return
+            yield {"event": "token", "data": {"text": self.FALLBACK_RESPONSE}}
+            yield {"event": "done", "data": {
+                "source": "fallback", "suggestions": self._default_topics(), "session_id": session_id
+            }}
+    
+    async def _load_session(self, session_id: str) -> Dict[str, Any]:
+        """Load a conversation state, starting an empty one for unknown or expired sessions."""
+        try:
+            state = await self.sessions.get(session_id)
+        except Exception as e:
+            self.log(f"Session load failed: {e}, starting a new conversation", level="warning")
+            state = None
+        return state or {"summary": "", "messages": []}
+    
+    def _has_history(self, state: Dict[str, Any]) -> bool:
+        return bool(state["summary"] or state["messages"])
+    
+    async def _record_turn(self, session_id: str, state: Dict[str, Any], query: str, answer: str):
+        """
+        Append a question and its answer to the session.
+        
+        Once more than SUPPORT_SESSION_MAX_TURNS turns are held, a background task
+        folds everything but the last SUPPORT_SESSION_KEEP_TURNS into the running
+        summary, so the prompt stays bounded without the reply waiting for it.
+        """
+        messages = state["messages"]
+        messages.append({"role": "user", "text": query})
+        messages.append({"role": "assistant", "text": answer})
+        
+        try:
+            await self.sessions.save(session_id, state)
+        except Exception as e:
+            self.log(f"Session save failed: {e}", level="warning")
+            return
+        
+        if len(messages) > 2 * settings.SUPPORT_SESSION_MAX_TURNS:
+            task = self._compactions.get(session_id)
+            if task is None or task.done():
+                self._compactions[session_id] = asyncio.create_task(self._compact(session_id))
+    
+    async def _compact(self, session_id: str):
+        """Summarize the older turns of a session, keeping turns recorded meanwhile."""
+        try:
+            state = await self._load_session(session_id)
+            keep = 2 * settings.SUPPORT_SESSION_KEEP_TURNS
+            older = state["messages"][:len(state["messages"]) - keep]
+            if not older:
+                return
+            summary = await self._summarize(state["summary"], older)
+            
+            # Re-read so turns recorded while summarizing are not lost; skip if
+            # another worker compacted the session first
+            latest = await self._load_session(session_id)
+            if latest["messages"][:len(older)] != older:
+                return
+            latest["summary"] = summary
+            latest["messages"] = latest["messages"][len(older):]
+            await self.sessions.save(session_id, latest)
+        except Exception as e:
+            self.log(f"Session compaction failed: {e}", level="warning")
+        finally:
+            self._compactions.pop(session_id, None)
+    
+    async def _summarize(self, summary: str, messages: List[Dict[str, str]]) -> str:
+        """Fold older turns into the running summary, truncating if Gemini is unavailable."""
+        transcript = self._format_messages(messages)
+        prompt = f"""Summarize this support conversation between a user and a dataset marketplace support agent.
+Keep the facts the agent needs to answer follow-up questions (what the user wants, datasets or issues mentioned, answers already given).
+
+Summary so far: {summary or "(none)"}
+
+New turns:
+{transcript}
+
+Reply with the updated summary only, at most {settings.SUPPORT_SESSION_SUMMARY_CHARS} characters."""
+        try:
+            updated = (await self.gemini.agenerate_text(prompt, max_tokens=300, priority="support")).strip()
+            metrics.incr("support_sessions.summaries", method="gemini")
+        except Exception as e:
+            self.log(f"Conversation summary failed: {e}, truncating instead", level="warning")
+            updated = f"{summary}\n{transcript}".strip()
+            metrics.incr("support_sessions.summaries", method="truncate")
+        # Keep the most recent part if the summary is still too long
+        return updated[-settings.SUPPORT_SESSION_SUMMARY_CHARS:]
+    
+    def _format_messages(self, messages: List[Dict[str, str]]) -> str:
+        return "\n".join(
+            f"{'User' if message['role'] == 'user' else 'Agent'}: {message['text']}" for message in messages
+        )
+    
+    def _ensure_faq_embedded(self):
+        """Start pinning the current FAQ version in the semantic cache if it is not pinned yet."""
+        if self._faq_embedded_version == self.faq.version:
+            return
+        if self._faq_embed_task is not None and not self._faq_embed_task.done():
+            return
+        if time.monotonic() < self._faq_embed_retry_at:
+            return
+        self._faq_embed_task = asyncio.create_task(self._embed_faq())
+    
+    async def _embed_faq(self):
+        """Embed every FAQ answer in the background and pin them in the semantic cache."""
+        version = self.faq.version
+        entries = self.faq.entries()
+        try:
+            # One batched call holds a single governor slot per EMBED_BATCH_SIZE entries
+            embeddings = await self.gemini.agenerate_embeddings(
+                [f"{', '.join(entry.keywords)}: {entry.answer}" for entry in entries], priority="support"
+            )
+        except Exception as e:
+            self._faq_embed_failures += 1
+            delay = min(
+                settings.SUPPORT_FAQ_EMBED_RETRY_SECONDS * 2 ** (self._faq_embed_failures - 1),
+                settings.SUPPORT_FAQ_EMBED_RETRY_MAX_SECONDS
+            )
+            self._faq_embed_retry_at = time.monotonic() + delay
+            self.log(f"FAQ embedding failed: {e}, retrying in {delay:.0f}s", level="warning")
+            return
+        self.semantic_cache.pin([
+            (embedding, entry.answer, "faq") for embedding, entry in zip(embeddings, entries)
+        ])
+        self._faq_embedded_version = version
+        self._faq_embed_failures = 0
+    
+    async def _semantic_lookup(self, query: str) -> Tuple[Optional[List[float]], Optional[Tuple[str, str]]]:
+        """
+        Embed the question and look it up in the semantic cache.
+        
+        Returns the question embedding (None if embedding failed) and the cached
+        (answer, source), if any.
+        """
+        self._ensure_faq_embedded()
+        
+        try:
+            embedding = await self.gemini.agenerate_embedding(query, priority="support")
+        except Exception as e:
+            self.log(f"Question embedding failed: {e}, skipping semantic cache", level="warning")
+            return None, None
+        return embedding, self.semantic_cache.lookup(embedding)
+    
     def _check_faq(self, query: str) -> Optional[str]:
         """Check if query matches FAQ keywords."""
-        for keyword, answer in self.faq_responses.items():
-            if keyword in query:
-                return answer
-        return None
+        entry = self.faq.match(query)
+        return entry.answer if entry else None
     
-    def _generate_gemini_response(self, query: str) -> str:
+    async def _generate_gemini_response(self, query: str, state: Optional[Dict[str, Any]] = None) -> str:
         """
         Generate response using Google Gemini.
         
         Uses Gemini's conversational capabilities to provide helpful, contextual answers.
         """
-        prompt = f"""You are a helpful support agent for a dataset marketplace platform.
+        response = await self.gemini.agenerate_text(
+            self._build_prompt(query, state), max_tokens=200, cache_family="support", priority="support"
+        )
+        return response.strip()
+    
+    def _build_prompt(self, query: str, state: Optional[Dict[str, Any]] = None) -> str:
+        """Build the support prompt for a user question, with the conversation so far if there is one."""
+        history = ""
+        if state and self._has_history(state):
+            parts = []
+            if state["summary"]:
+                parts.append(f"Earlier in this conversation: {state['summary']}")
+            if state["messages"]:
+                parts.append(self._format_messages(state["messages"]))
+            history = "Conversation so far:\n" + "\n".join(parts) + "\n\n"
+        
+        return f"""You are a helpful support agent for a dataset marketplace platform.
 
 Platform Features:
 - Users can browse and search for datasets
@@ -94,17 +375,18 @@ Platform Features:
 - Datasets have categories, tags, ratings, and reviews
 - Users need to be logged in to purchase datasets
 
-User Question: {query}
+{history}User Question: {query}
 
 Provide a helpful, concise answer (2-3 sentences). Be friendly and professional."""
-        
-        response = self.gemini.generate_text(prompt, max_tokens=200)
-        return response.strip()
     
     def _get_related_topics(self, query: str) -> List[str]:
         """Get related FAQ topics."""
-        related = [k for k in self.faq_responses.keys() if k not in query]
-        return related[:3]
+        related = (topic for topic in self.faq.topics() if topic not in query)
+        return list(islice(related, 3))
+    
+    def _default_topics(self) -> List[str]:
+        """Topics suggested when there is nothing more specific to offer."""
+        return self.faq.topics()[:5]
     
     def get_capabilities(self) -> List[str]:
         return [
@@ -112,5 +394,8 @@ Provide a helpful, concise answer (2-3 sentences). Be friendly and professional.
             "gemini_conversational_ai",
             "query_understanding",
             "suggestion_generation",
-            "contextual_responses"
+            "contextual_responses",
+            "streaming_responses",
+            "semantic_answer_cache",
+            "multi_turn_sessions"
         ]
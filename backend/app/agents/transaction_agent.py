@@ -1,10 +1,16 @@
 """Transaction agent for handling purchases and payments."""
 from typing import Dict, Any, Optional, List
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 from datetime import datetime
 import uuid
 from app.agents.base_agent import BaseAgent
-from app.models.dataset import Dataset, User, Purchase
+from app.core.principal import principal_cache
+from app.models.dataset import Dataset, User, Purchase, IdempotencyKey
+from app.schemas.dataset import PurchaseResponse, CheckoutResponse
+from app.services import events, idempotency, ledger
 
 
 class TransactionAgent(BaseAgent):
@@ -21,80 +27,113 @@ class TransactionAgent(BaseAgent):
         Process a dataset purchase.
         
         Args:
-            input_data: Contains 'db' (database session), 'user_id' (int), 'dataset_id' (int)
+            input_data: Contains 'db' (database session), 'user_id' (int),
+                'dataset_id' (int) or 'dataset_ids' (list of int) for a checkout,
+                and an optional 'idempotency_key' (str)
             context: Optional context from other agents
             
         Returns:
-            Dictionary with 'purchase' (Purchase object) and 'status' (str)
+            Dictionary with 'purchase' (Purchase object), or 'purchases' for a
+            checkout, and 'status' (str). A retry of a completed request with the
+            same idempotency key returns 'replayed' with the stored 'response'
+            and 'status_code' instead.
         """
-        db: Session = input_data.get("db")
+        db: AsyncSession = input_data.get("db")
         user_id: int = input_data.get("user_id")
         dataset_id: int = input_data.get("dataset_id")
+        dataset_ids: Optional[List[int]] = input_data.get("dataset_ids")
+        idempotency_key: Optional[str] = input_data.get("idempotency_key")
         
-        if not db or not user_id or not dataset_id:
+        if not db or not user_id or not (dataset_id or dataset_ids):
             return {"error": "Missing required parameters", "status": "failed"}
         
-        # Get user and dataset
-        user = db.query(User).filter(User.id == user_id).first()
-        dataset = db.query(Dataset).filter(
+        record = None
+        if idempotency_key:
+            endpoint = "checkout" if dataset_ids is not None else "purchase"
+            fingerprint = idempotency.request_hash(endpoint, {"dataset_id": dataset_id, "dataset_ids": dataset_ids})
+            try:
+                record = await idempotency.lookup(db, user_id, idempotency_key, fingerprint)
+                if record is None:
+                    record = await idempotency.claim(db, user_id, idempotency_key, endpoint, fingerprint)
+            except idempotency.IdempotencyConflict:
+                return {"error": "Idempotency key was already used for a different request", "status": "failed"}
+            if record.status_code is not None:
+                self.log(f"Replaying {endpoint} for idempotency key {idempotency_key}")
+                return {
+                    "status": "completed",
+                    "replayed": True,
+                    "status_code": record.status_code,
+                    "response": record.response
+                }
+        
+        if dataset_ids is not None:
+            return await self._checkout(db, user_id, dataset_ids, record)
+        return await self._purchase(db, user_id, dataset_id, record)
+    
+    async def _purchase(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        dataset_id: int,
+        record: Optional[IdempotencyKey] = None
+    ) -> Dict[str, Any]:
+        """Buy a single dataset."""
+        # Get dataset
+        result = await db.execute(select(Dataset).options(
+            load_only(Dataset.id, Dataset.price, Dataset.seller_id)
+        ).where(
             Dataset.id == dataset_id,
             Dataset.is_active == True
-        ).first()
-        
-        if not user:
-            return {"error": "User not found", "status": "failed"}
+        ))
+        dataset = result.scalar_one_or_none()
         
         if not dataset:
             return {"error": "Dataset not found or inactive", "status": "failed"}
         
-        # Check if user already purchased this dataset
-        existing_purchase = db.query(Purchase).filter(
-            Purchase.buyer_id == user_id,
-            Purchase.dataset_id == dataset_id,
-            Purchase.status == "completed"
-        ).first()
-        
-        if existing_purchase:
-            return {
-                "error": "Dataset already purchased",
-                "status": "failed",
-                "purchase": existing_purchase
-            }
-        
-        # Check user balance (in a real system, integrate with payment gateway)
-        if user.balance < dataset.price:
-            return {
-                "error": "Insufficient balance",
-                "status": "failed",
-                "required": dataset.price,
-                "available": user.balance
-            }
+        # Debit the buyer with a conditional in-place update (in a real system,
+        # integrate with payment gateway). The balance is never read and written
+        # back, so concurrent purchases cannot lose updates or overspend. The
+        # buyer row is locked before the purchase row is inserted, the same
+        # order as _checkout, so a purchase and a checkout of the same buyer
+        # cannot deadlock on the row lock and the unique index.
+        price = dataset.price
+        debit_error = await self._debit(db, user_id, price)
+        if debit_error:
+            return debit_error
         
-        # Create purchase record
+        # Create purchase record. The partial unique index on completed purchases
+        # rejects a second purchase of the same dataset, so there is no separate
+        # ownership check and no window for two concurrent purchases to both pass it.
+        # A rejected insert rolls the debit back with it.
         transaction_id = str(uuid.uuid4())
         purchase = Purchase(
             buyer_id=user_id,
             dataset_id=dataset_id,
-            amount=dataset.price,
+            amount=price,
             transaction_id=transaction_id,
-            status="pending"
+            status="completed"
         )
-        
         db.add(purchase)
+        try:
+            await db.flush()
+        except IntegrityError:
+            await db.rollback()
+            return {"error": "Dataset already purchased", "status": "failed"}
         
-        # Deduct balance and update seller balance
-        user.balance -= dataset.price
-        seller = dataset.seller
-        if seller:
-            seller.balance += dataset.price
+        # Credit the seller through the ledger so sales of one seller's datasets
+        # never contend on the seller's balance row
+        ledger.credit(db, dataset.seller_id, price, transaction_id)
         
-        # Update dataset download count
-        dataset.download_count += 1
+        # Side effects (download counts, trending, ...) are delivered from the outbox
+        await events.publish(db, "purchase.completed", [self._purchase_event(purchase, dataset.seller_id)])
         
         # Complete transaction
-        purchase.status = "completed"
-        db.commit()
-        db.refresh(purchase)
+        if record is not None:
+            await db.refresh(purchase)
+            idempotency.complete(record, 201, PurchaseResponse.model_validate(purchase).model_dump(mode="json"))
+        await db.commit()
+        principal_cache.invalidate_user(user_id)
+        await db.refresh(purchase)
         
         self.log(f"Purchase completed: {transaction_id} for dataset {dataset_id} by user {user_id}")
         
@@ -104,6 +143,135 @@ class TransactionAgent(BaseAgent):
             "transaction_id": transaction_id
         }
     
+    async def _checkout(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        dataset_ids: List[int],
+        record: Optional[IdempotencyKey] = None
+    ) -> Dict[str, Any]:
+        """
+        Buy several datasets in one transaction, all or nothing.
+        
+        Availability and ownership are checked in one query, the buyer is debited
+        once for the total, and the seller credits and purchase rows are each
+        written with a single bulk insert.
+        """
+        dataset_ids = list(dict.fromkeys(dataset_ids))
+        
+        # Datasets together with any completed purchase of them by this buyer
+        result = await db.execute(
+            select(Dataset.id, Dataset.price, Dataset.seller_id, Purchase.id)
+            .outerjoin(Purchase, and_(
+                Purchase.dataset_id == Dataset.id,
+                Purchase.buyer_id == user_id,
+                Purchase.status == "completed"
+            ))
+            .where(Dataset.id.in_(dataset_ids), Dataset.is_active == True)
+        )
+        rows = {row[0]: row for row in result.all()}
+        
+        missing = [dataset_id for dataset_id in dataset_ids if dataset_id not in rows]
+        if missing:
+            return {"error": "Dataset not found or inactive", "status": "failed", "dataset_ids": missing}
+        
+        owned = [dataset_id for dataset_id in dataset_ids if rows[dataset_id][3] is not None]
+        if owned:
+            return {"error": "Dataset already purchased", "status": "failed", "dataset_ids": owned}
+        
+        # Buyer row lock first, then the purchase inserts, as in _purchase
+        total = sum(rows[dataset_id][1] for dataset_id in dataset_ids)
+        debit_error = await self._debit(db, user_id, total)
+        if debit_error:
+            return debit_error
+        
+        items = [
+            {
+                "buyer_id": user_id,
+                "dataset_id": dataset_id,
+                "amount": rows[dataset_id][1],
+                "transaction_id": str(uuid.uuid4()),
+                "status": "completed"
+            }
+            for dataset_id in dataset_ids
+        ]
+        await ledger.credit_many(db, [
+            (rows[item["dataset_id"]][2], item["amount"], item["transaction_id"]) for item in items
+        ])
+        try:
+            result = await db.scalars(insert(Purchase).returning(Purchase), items)
+        except IntegrityError:
+            # Lost a race with a concurrent purchase of one of the datasets
+            await db.rollback()
+            return {"error": "Dataset already purchased", "status": "failed"}
+        purchases = result.all()
+        await events.publish(db, "purchase.completed", [
+            self._purchase_event(p, rows[p.dataset_id][2]) for p in purchases
+        ])
+        if record is not None:
+            response = CheckoutResponse(
+                purchases=[PurchaseResponse.model_validate(p) for p in purchases],
+                total_amount=total
+            )
+            idempotency.complete(record, 201, response.model_dump(mode="json"))
+        await db.commit()
+        principal_cache.invalidate_user(user_id)
+        
+        self.log(f"Checkout completed: {len(purchases)} datasets for {total} by user {user_id}")
+        
+        return {
+            "purchases": purchases,
+            "status": "completed",
+            "total_amount": total
+        }
+    
+    def _purchase_event(self, purchase: Purchase, seller_id: int) -> Dict[str, Any]:
+        return {
+            "purchase_id": purchase.id,
+            "buyer_id": purchase.buyer_id,
+            "seller_id": seller_id,
+            "dataset_id": purchase.dataset_id,
+            "amount": purchase.amount,
+            "transaction_id": purchase.transaction_id
+        }
+    
+    async def _debit(self, db: AsyncSession, user_id: int, amount: float) -> Optional[Dict[str, Any]]:
+        """
+        Debit the buyer with a conditional in-place update.
+        
+        The check is against the effective balance (stored balance plus unrolled
+        ledger credits), the same figure the API reports. The stored balance may
+        go negative while credits are waiting for the rollup.
+        
+        Returns None on success; otherwise rolls back and returns the failure result.
+        """
+        # Lock the buyer first so the ledger tail below is read after any rollup of
+        # this user has committed; otherwise its balance increase and the entries
+        # it marks rolled up could both be counted
+        await db.execute(select(User.id).where(User.id == user_id).with_for_update())
+        debit = await db.execute(
+            update(User)
+            .where(User.id == user_id, User.balance + ledger.unrolled_total(user_id) >= amount)
+            .values(balance=User.balance - amount)
+            .returning(User.id)
+        )
+        if debit.scalar_one_or_none() is not None:
+            return None
+        
+        await db.rollback()
+        available = (await db.execute(
+            select(func.coalesce(User.balance, 0.0) + ledger.unrolled_total(user_id)).where(User.id == user_id)
+        )).scalar_one_or_none()
+        if available is None:
+            return {"error": "User not found", "status": "failed"}
+        return {
+            "error": "Insufficient balance",
+            "status": "failed",
+            "required": amount,
+            "available": available
+        }
+    
     def get_capabilities(self) -> List[str]:
-        return ["purchase_processing", "balance_management", "duplicate_check", "transaction_tracking"]
+        return ["purchase_processing", "balance_management", "duplicate_check", "transaction_tracking", "bulk_checkout",
+                "idempotent_requests"]
 
@@ -1,12 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from authlib.integrations.starlette_client import OAuth
-from app.database import get_db
+from app.database import get_async_db
 from app.models.dataset import User
 from app.core.config import settings
-from app.core.security import create_access_token, verify_password
+from app.core.security import create_access_token, averify_password
 from app.api.deps import get_current_user
+from app.core.principal import Principal
+from app.services.ledger import effective_balance
 
 router = APIRouter(tags=["auth"])
 
@@ -27,7 +31,7 @@ async def login_google(request: Request):
     return await oauth.google.authorize_redirect(request, redirect_uri)
 
 @router.get("/auth/callback")
-async def auth_callback(request: Request, db: Session = Depends(get_db)):
+async def auth_callback(request: Request, db: AsyncSession = Depends(get_async_db)):
     try:
         token = await oauth.google.authorize_access_token(request)
     except Exception as e:
@@ -43,7 +47,8 @@ async def auth_callback(request: Request, db: Session = Depends(get_db)):
     picture = user_info.get('picture')
     
     # Check if user exists
-    user = db.query(User).filter(User.email == email).first()
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalar_one_or_none()
     
     if not user:
         # Create new user
@@ -57,15 +62,15 @@ async def auth_callback(request: Request, db: Session = Depends(get_db)):
             balance=1000.0 # Starting balance for demo
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
     else:
         # Update existing user info
         if not user.google_id:
             user.google_id = google_id
         if not user.avatar_url:
             user.avatar_url = picture
-        db.commit()
+        await db.commit()
         
     # Create access token
     access_token = create_access_token(subject=user.id)
@@ -80,7 +85,7 @@ async def auth_callback(request: Request, db: Session = Depends(get_db)):
         "email": user.email,
         "full_name": user.full_name,
         "avatar_url": user.avatar_url,
-        "balance": user.balance
+        "balance": await effective_balance(db, user)
     }
     
     params = {
@@ -92,9 +97,10 @@ async def auth_callback(request: Request, db: Session = Depends(get_db)):
     return RedirectResponse(url=f"http://localhost:3000/auth/callback?{query_string}")
 
 @router.post("/login")
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(User).where(User.email == form_data.username))
+    user = result.scalar_one_or_none()
+    if not user or not await averify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -110,10 +116,10 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
             "email": user.email,
             "full_name": user.full_name,
             "avatar_url": user.avatar_url,
-            "balance": user.balance
+            "balance": await effective_balance(db, user)
         }
     }
 
 @router.get("/me")
-async def read_users_me(current_user: User = Depends(get_current_user)):
-    return current_user
+async def read_users_me(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    return {**jsonable_encoder(current_user), "balance": await effective_balance(db, current_user)}
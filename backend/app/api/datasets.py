@@ -1,12 +1,20 @@
 """API endpoints for dataset operations."""
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
-from app.schemas.dataset import DatasetResponse, DatasetSearch, DatasetCreate, DatasetUpdate
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional, Tuple
+from app.database import get_async_db
+from app.schemas.dataset import DatasetResponse, DatasetListItem, DatasetSearch, DatasetCreate, DatasetUpdate
 from app.agents.agent_orchestrator import AgentOrchestrator
-from app.models.dataset import Dataset, User
+from app.models.dataset import Dataset, DATASET_LIST_FIELDS, dataset_list_columns
 from app.api.deps import get_current_user
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.principal import Principal
+from app.services.trending import trending_counters
+from app.services.dataset_versions import dataset_versions
+import hashlib
 import logging
 
 router = APIRouter(prefix="/api/datasets", tags=["datasets"])
@@ -15,24 +23,100 @@ logger = logging.getLogger(__name__)
 # Initialize orchestrator
 orchestrator = AgentOrchestrator()
 
+FIELDS_QUERY = Query(
+    None,
+    description=f"Comma-separated fields to return for each dataset; any of: {', '.join(DATASET_LIST_FIELDS)}"
+)
 
-@router.get("/", response_model=List[DatasetResponse])
+
+def _parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """Validate a `fields=` parameter; no parameter means every list field."""
+    if not fields:
+        return DATASET_LIST_FIELDS
+    names = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in DATASET_LIST_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return ("id", *names)
+
+
+def _project(datasets: List[Dataset], fields: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    """Plain dicts of the requested fields, ready for orjson without a validation pass."""
+    return [{name: getattr(d, name) for name in fields} for d in datasets]
+
+
+def _json(content: Any, endpoint: str) -> ORJSONResponse:
+    """
+    Encode a list response in one orjson pass.
+    
+    Returning the response directly skips FastAPI's response_model validation and
+    jsonable_encoder; the response_model on these routes documents the shape.
+    """
+    with metrics.timer("api.serialize_ms", endpoint=endpoint):
+        return ORJSONResponse(content)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison, as If-None-Match uses."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith("W/") else tag) == opaque:
+            return True
+    return False
+
+
+def _not_modified(etag: str, cache_control: str, endpoint: str) -> Response:
+    metrics.incr("api.not_modified", endpoint=endpoint)
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def _conditional(response: ORJSONResponse, if_none_match: Optional[str], endpoint: str) -> Response:
+    """Tag a public list response with a weak hash of its body; 304 when the client already has it."""
+    cache_control = f"public, max-age={settings.DATASET_LIST_MAX_AGE_SECONDS}"
+    etag = f'W/"{hashlib.blake2b(response.body, digest_size=16).hexdigest()}"'
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag, cache_control, endpoint)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def _dataset_etag(dataset_id: int, version: int) -> str:
+    # Weak, because the compression middleware may send the same version in
+    # several encodings; a 304 then carries exactly the tag its 200 had
+    return f'W/"d{dataset_id}-v{version}"'
+
+
+@router.get("/", response_model=List[DatasetListItem], response_class=ORJSONResponse)
 async def list_datasets(
     skip: int = 0,
     limit: int = 20,
-    db: Session = Depends(get_db)
+    fields: Optional[str] = FIELDS_QUERY,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """List all active datasets."""
-    datasets = db.query(Dataset).filter(Dataset.is_active == True).offset(skip).limit(limit).all()
-    return datasets
+    """List all active datasets, reading only the columns the response needs."""
+    names = _parse_fields(fields)
+    result = await db.execute(
+        select(*dataset_list_columns(names))
+        .where(Dataset.is_active == True).offset(skip).limit(limit)
+    )
+    return _conditional(_json([dict(row._mapping) for row in result], "list"), if_none_match, "list")
 
 
-@router.get("/search", response_model=dict)
+@router.get("/search", response_model=dict, response_class=ORJSONResponse)
 async def search_datasets(
     search_params: DatasetSearch = Depends(),
-    db: Session = Depends(get_db)
+    fields: Optional[str] = FIELDS_QUERY,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Search datasets using the search agent."""
+    names = _parse_fields(fields)
     result = await orchestrator.execute(
         "search",
         {
@@ -44,24 +128,23 @@ async def search_datasets(
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     
-    # Convert ORM objects to response models
-    datasets = [DatasetResponse.model_validate(d) for d in result["datasets"]]
-    
-    return {
-        "datasets": datasets,
+    return _json({
+        "datasets": _project(result["datasets"], names),
         "external_datasets": result.get("external_datasets", []),
         "total": result["total"],
         "page": result["page"],
         "page_size": result["page_size"]
-    }
+    }, "search")
 
 
-@router.get("/recommendations", response_model=dict)
+@router.get("/recommendations", response_model=dict, response_class=ORJSONResponse)
 async def get_recommendations(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    fields: Optional[str] = FIELDS_QUERY,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """Get dataset recommendations for the current user."""
+    names = _parse_fields(fields)
     result = await orchestrator.execute(
         "recommendation",
         {
@@ -73,30 +156,71 @@ async def get_recommendations(
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     
-    recommendations = [DatasetResponse.model_validate(d) for d in result["recommendations"]]
-    
-    return {
-        "recommendations": recommendations,
+    return _json({
+        "recommendations": _project(result["recommendations"], names),
         "external_recommendations": result.get("external_recommendations", []),
         "count": result["count"]
-    }
+    }, "recommendations")
+
+
+@router.get("/trending", response_model=List[DatasetListItem], response_class=ORJSONResponse)
+async def get_trending(
+    fields: Optional[str] = FIELDS_QUERY,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get trending datasets for anonymous and cold-start users."""
+    names = _parse_fields(fields)
+    result = await orchestrator.execute("recommendation", {"db": db, "user_id": None})
+    
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    
+    return _conditional(_json(_project(result["recommendations"], names), "trending"), if_none_match, "trending")
 
 
 @router.get("/{dataset_id}", response_model=DatasetResponse)
-async def get_dataset(dataset_id: int, db: Session = Depends(get_db)):
-    """Get a specific dataset by ID."""
-    dataset = db.query(Dataset).filter(Dataset.id == dataset_id).first()
+async def get_dataset(
+    dataset_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get a specific dataset by ID.
+    
+    Revalidations whose tag matches the cached version are answered with 304
+    before the row is loaded.
+    """
+    cache_control = f"public, max-age={settings.DATASET_DETAIL_MAX_AGE_SECONDS}"
+    if if_none_match:
+        version = dataset_versions.get(dataset_id)
+        if version is not None:
+            etag = _dataset_etag(dataset_id, version)
+            if _etag_matches(if_none_match, etag):
+                trending_counters.record_view(dataset_id)
+                return _not_modified(etag, cache_control, "detail")
+
+    dataset = await db.get(Dataset, dataset_id)
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
-    return dataset
+    trending_counters.record_view(dataset_id)
+    dataset_versions.put(dataset_id, dataset.version)
+    etag = _dataset_etag(dataset_id, dataset.version)
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag, cache_control, "detail")
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return DatasetResponse.model_validate(dataset)
 
 
 
 @router.post("/", response_model=DatasetResponse, status_code=status.HTTP_201_CREATED)
 async def create_dataset(
     dataset: DatasetCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """Create a new dataset (seller only)."""
     # In a real app, check if current_user.is_seller
@@ -109,8 +233,8 @@ async def create_dataset(
         seller_id=current_user.id
     )
     db.add(db_dataset)
-    db.commit()
-    db.refresh(db_dataset)
+    await db.commit()
+    await db.refresh(db_dataset)
     return db_dataset
 
 
@@ -118,10 +242,10 @@ async def create_dataset(
 async def update_dataset(
     dataset_id: int,
     dataset_update: DatasetUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update a dataset."""
-    dataset = db.query(Dataset).filter(Dataset.id == dataset_id).first()
+    dataset = await db.get(Dataset, dataset_id)
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
@@ -131,8 +255,10 @@ async def update_dataset(
         setattr(dataset, field, value)
     if metadata_payload is not None:
         dataset.metadata_json = metadata_payload
+    dataset.version = Dataset.version + 1
     
-    db.commit()
-    db.refresh(dataset)
+    await db.commit()
+    await db.refresh(dataset)
+    dataset_versions.put(dataset.id, dataset.version)
     return dataset
 
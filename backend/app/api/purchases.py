@@ -1,12 +1,15 @@
 """API endpoints for purchase operations."""
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
-from app.schemas.dataset import PurchaseCreate, PurchaseResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.database import get_async_db
+from app.schemas.dataset import PurchaseCreate, PurchaseResponse, CheckoutCreate, CheckoutResponse
 from app.agents.agent_orchestrator import AgentOrchestrator
-from app.models.dataset import Purchase, User
+from app.models.dataset import Purchase
 from app.api.deps import get_current_user
+from app.core.principal import Principal
 import logging
 
 router = APIRouter(prefix="/api/purchases", tags=["purchases"])
@@ -20,44 +23,95 @@ orchestrator = AgentOrchestrator()
 @router.post("/", response_model=PurchaseResponse, status_code=status.HTTP_201_CREATED)
 async def create_purchase(
     purchase: PurchaseCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, max_length=255)
 ):
-    """Purchase a dataset using the transaction agent."""
+    """
+    Purchase a dataset using the transaction agent.
+    
+    Retrying with the same Idempotency-Key header returns the original response
+    instead of buying again.
+    """
     result = await orchestrator.execute(
         "transaction",
         {
             "db": db,
             "user_id": current_user.id,
-            "dataset_id": purchase.dataset_id
+            "dataset_id": purchase.dataset_id,
+            "idempotency_key": idempotency_key
         }
     )
     
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     
+    if result.get("replayed"):
+        return _replay(result)
+    
     if result["status"] != "completed":
         raise HTTPException(status_code=400, detail=f"Purchase failed: {result.get('error', 'Unknown error')}")
     
     return PurchaseResponse.model_validate(result["purchase"])
 
 
+@router.post("/checkout", response_model=CheckoutResponse, status_code=status.HTTP_201_CREATED)
+async def checkout(
+    cart: CheckoutCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, max_length=255)
+):
+    """Purchase several datasets in one all-or-nothing transaction."""
+    result = await orchestrator.execute(
+        "transaction",
+        {
+            "db": db,
+            "user_id": current_user.id,
+            "dataset_ids": cart.dataset_ids,
+            "idempotency_key": idempotency_key
+        }
+    )
+    
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    
+    if result.get("replayed"):
+        return _replay(result)
+    
+    return CheckoutResponse(
+        purchases=[PurchaseResponse.model_validate(p) for p in result["purchases"]],
+        total_amount=result["total_amount"]
+    )
+
+
+def _replay(result: dict) -> JSONResponse:
+    """Return the stored response of an earlier request with the same Idempotency-Key."""
+    return JSONResponse(
+        content=result["response"],
+        status_code=result["status_code"],
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+
 @router.get("/mine", response_model=List[PurchaseResponse])
 async def get_user_purchases(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """Get all purchases for the current user."""
-    purchases = db.query(Purchase).filter(
-        Purchase.buyer_id == current_user.id
-    ).order_by(Purchase.purchased_at.desc()).all()
-    return purchases
+    result = await db.execute(
+        select(Purchase).where(
+            Purchase.buyer_id == current_user.id
+        ).order_by(Purchase.purchased_at.desc())
+    )
+    return result.scalars().all()
 
 
 @router.get("/{purchase_id}", response_model=PurchaseResponse)
-async def get_purchase(purchase_id: int, db: Session = Depends(get_db)):
+async def get_purchase(purchase_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific purchase by ID."""
-    purchase = db.query(Purchase).filter(Purchase.id == purchase_id).first()
+    purchase = await db.get(Purchase, purchase_id)
     if not purchase:
         raise HTTPException(status_code=404, detail="Purchase not found")
     return purchase
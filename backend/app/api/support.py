@@ -1,7 +1,11 @@
 """API endpoints for support operations."""
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from app.agents.agent_orchestrator import AgentOrchestrator
+from app.core.metrics import metrics
 from pydantic import BaseModel
+from typing import Optional
+import json
 import logging
 
 router = APIRouter(prefix="/api/support", tags=["support"])
@@ -14,20 +18,39 @@ orchestrator = AgentOrchestrator()
 class SupportQuery(BaseModel):
     """Schema for support query."""
     query: str
+    session_id: Optional[str] = None
 
 
 @router.post("/query")
 async def handle_support_query(query: SupportQuery):
     """Handle user support queries using the support agent."""
-    result = await orchestrator.execute(
-        "support",
-        {
-            "query": query.query
-        }
-    )
+    # Whole-answer latency, comparable with support.first_token_ms of the streaming endpoint
+    with metrics.timer("support.response_ms"):
+        result = await orchestrator.execute(
+            "support",
+            {
+                "query": query.query,
+                "session_id": query.session_id
+            }
+        )
     
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     
     return result
 
+
+@router.post("/query/stream")
+async def stream_support_query(query: SupportQuery):
+    """Stream the support agent's answer as Server-Sent Events."""
+    events = orchestrator.stream("support", {"query": query.query, "session_id": query.session_id})
+    
+    async def event_source():
+        async for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
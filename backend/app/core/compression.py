@@ -0,0 +1,210 @@
+"""Response compression middleware with content negotiation and a compressed-body cache."""
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.metrics import metrics
+import gzip
+import hashlib
+import threading
+import time
+
+# Optional encoders; each is offered only when its package is installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml")
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies keyed on (encoding, hash of the uncompressed body)."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: Tuple[str, bytes]) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key: Tuple[str, bytes], body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = body
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+            metrics.set_gauge("compression.cache_bytes", self._bytes)
+
+
+class CompressionMiddleware:
+    """
+    Compress buffered responses with the best encoding the client accepts.
+
+    Brotli and zstd are preferred over gzip when the client accepts them.
+    Responses below `minimum_size`, non-text content, already-encoded bodies
+    and streamed responses (such as the support Server-Sent Events) are sent
+    uncompressed; text responses carry `Vary: Accept-Encoding` either way.
+    Compressed bodies of GET responses that are not marked private or no-store
+    are cached by content hash, so hot list responses are compressed once.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+        cache_entries: int = 512,
+        cache_max_bytes: int = 32 * 1024 * 1024
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.zstd_level = zstd_level
+        self.cache = CompressedBodyCache(cache_entries, cache_max_bytes)
+        self._zstd_local = threading.local()
+
+        # Server preference, best first
+        self.encodings = [
+            encoding for encoding, available in (
+                ("br", brotli is not None),
+                ("zstd", zstandard is not None),
+                ("gzip", True)
+            ) if available
+        ]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # None when the client accepts no encoding we offer; Vary is still added below
+        encoding = self._negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            not_modified = start["status"] == 304
+            compressible = self._compressible(headers)
+            if compressible or not_modified:
+                # Any response that could have been compressed varies by
+                # Accept-Encoding, so shared caches must key on it; a 304 carries
+                # the Vary of the 200 it stands for
+                headers.add_vary_header("Accept-Encoding")
+            if (
+                encoding is None or not compressible or not_modified
+                or message.get("more_body", False) or len(body) < self.minimum_size
+            ):
+                # Streamed or not worth compressing: send as produced
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            cacheable = scope["method"] == "GET" and not any(
+                directive in headers.get("cache-control", "") for directive in ("no-store", "private")
+            )
+            compressed = self._compress_cached(encoding, body, cacheable)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # The compressed bytes differ from the tagged representation
+                headers["ETag"] = "W/" + etag
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _negotiate(self, accept_encoding: str) -> Optional[str]:
+        """Pick the preferred encoding with the highest non-zero q-value, if any."""
+        if not accept_encoding:
+            return None
+        qualities: Dict[str, float] = {}
+        for part in accept_encoding.split(","):
+            name, _, params = part.strip().partition(";")
+            quality = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            qualities[name.strip().lower()] = quality
+
+        wildcard = qualities.get("*", 0.0)
+        best, best_quality = None, 0.0
+        for encoding in self.encodings:
+            quality = qualities.get(encoding, wildcard)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def _compressible(self, headers: MutableHeaders) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+    def _compress_cached(self, encoding: str, body: bytes, cacheable: bool) -> bytes:
+        key = None
+        if cacheable:
+            key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+            cached = self.cache.get(key)
+            if cached is not None:
+                metrics.incr("compression.cache_hits", encoding=encoding)
+                return cached
+            metrics.incr("compression.cache_misses", encoding=encoding)
+
+        start = time.perf_counter()
+        compressed = self._compress(encoding, body)
+        metrics.observe("compression.ms", (time.perf_counter() - start) * 1000, encoding=encoding)
+        metrics.observe("compression.ratio", len(compressed) / len(body), encoding=encoding)
+        if key is not None:
+            self.cache.put(key, compressed)
+        return compressed
+
+    def _compress(self, encoding: str, body: bytes) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        if encoding == "zstd":
+            # Compressor objects are not thread-safe; keep one per thread
+            compressor = getattr(self._zstd_local, "compressor", None)
+            if compressor is None:
+                compressor = zstandard.ZstdCompressor(level=self.zstd_level)
+                self._zstd_local.compressor = compressor
+            return compressor.compress(body)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
@@ -13,10 +13,20 @@ class Settings:
     POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", "5432")
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "dataset_platform")
     DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}"
+    # Async driver URL used by the API and agents (e.g. sqlite+aiosqlite:///./test.db in tests)
+    ASYNC_DATABASE_URL: str = os.getenv(
+        "ASYNC_DATABASE_URL",
+        f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}"
+    )
 
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-super-secret-key-change-this")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
+    # Verified principals cached per worker, keyed on the token
+    AUTH_PRINCIPAL_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+    AUTH_PRINCIPAL_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+    # Processes for bcrypt hashing and verification
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
 
     # Google OAuth
     GOOGLE_CLIENT_ID: str = os.getenv("GOOGLE_CLIENT_ID", "")
@@ -25,6 +35,95 @@ class Settings:
     
     # Google Gemini API
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    GEMINI_MAX_WORKERS: int = int(os.getenv("GEMINI_MAX_WORKERS", "16"))  # Threads for blocking SDK calls
+    GEMINI_REQUESTS_PER_MINUTE: float = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+    GEMINI_BURST: int = int(os.getenv("GEMINI_BURST", "10"))
+    GEMINI_EMBED_REQUESTS_PER_MINUTE: float = float(os.getenv("GEMINI_EMBED_REQUESTS_PER_MINUTE", "1500"))
+    GEMINI_EMBED_BURST: int = int(os.getenv("GEMINI_EMBED_BURST", "100"))
+    GEMINI_MAX_IN_FLIGHT: int = int(os.getenv("GEMINI_MAX_IN_FLIGHT", "8"))
+    GEMINI_MAX_QUEUE: int = int(os.getenv("GEMINI_MAX_QUEUE", "100"))
+    GEMINI_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("GEMINI_QUEUE_TIMEOUT_SECONDS", "10"))
+    GEMINI_BREAKER_FAILURE_RATE: float = float(os.getenv("GEMINI_BREAKER_FAILURE_RATE", "0.5"))
+    GEMINI_BREAKER_MIN_CALLS: int = int(os.getenv("GEMINI_BREAKER_MIN_CALLS", "10"))
+    GEMINI_BREAKER_WINDOW: int = int(os.getenv("GEMINI_BREAKER_WINDOW", "20"))
+    GEMINI_BREAKER_OPEN_SECONDS: float = float(os.getenv("GEMINI_BREAKER_OPEN_SECONDS", "30"))
+    GEMINI_BREAKER_HALF_OPEN_CALLS: int = int(os.getenv("GEMINI_BREAKER_HALF_OPEN_CALLS", "1"))
+    # Dataset embeddings kept per worker by each agent that ranks by similarity
+    DATASET_EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("DATASET_EMBEDDING_CACHE_MAX_ENTRIES", "5000"))
+    # Search results ranked by embedding similarity; lower-scored matches keep the traditional order
+    SEARCH_SEMANTIC_MAX_DATASETS: int = int(os.getenv("SEARCH_SEMANTIC_MAX_DATASETS", "100"))
+
+    # Local fake text model with a fixed per-token delay (for development and latency tests)
+    LLM_FAKE_PROVIDER: bool = os.getenv("LLM_FAKE_PROVIDER", "").lower() in ("1", "true", "yes")
+    LLM_FAKE_TOKEN_LATENCY_MS: float = float(os.getenv("LLM_FAKE_TOKEN_LATENCY_MS", "50"))
+
+    # Support FAQ knowledge base
+    SUPPORT_FAQ_PATH: str = os.getenv(
+        "SUPPORT_FAQ_PATH",
+        os.path.join(os.path.dirname(os.path.dirname(__file__)), "agents", "faq.yaml")
+    )
+    SUPPORT_FAQ_RELOAD_SECONDS: float = float(os.getenv("SUPPORT_FAQ_RELOAD_SECONDS", "5"))
+
+    # Support agent semantic answer cache
+    SUPPORT_SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SUPPORT_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    SUPPORT_SEMANTIC_CACHE_MAX_ENTRIES: int = int(os.getenv("SUPPORT_SEMANTIC_CACHE_MAX_ENTRIES", "512"))
+    SUPPORT_SEMANTIC_CACHE_TTL_SECONDS: float = float(os.getenv("SUPPORT_SEMANTIC_CACHE_TTL_SECONDS", str(60 * 60)))
+    # Failed FAQ embedding runs are retried with exponential backoff up to the maximum
+    SUPPORT_FAQ_EMBED_RETRY_SECONDS: float = float(os.getenv("SUPPORT_FAQ_EMBED_RETRY_SECONDS", "5"))
+    SUPPORT_FAQ_EMBED_RETRY_MAX_SECONDS: float = float(os.getenv("SUPPORT_FAQ_EMBED_RETRY_MAX_SECONDS", "300"))
+
+    # Multi-turn support sessions (set a Redis URL to share them between workers)
+    SUPPORT_SESSION_REDIS_URL: str = os.getenv("SUPPORT_SESSION_REDIS_URL", "")
+    SUPPORT_SESSION_MAX_SESSIONS: int = int(os.getenv("SUPPORT_SESSION_MAX_SESSIONS", "10000"))
+    SUPPORT_SESSION_IDLE_SECONDS: float = float(os.getenv("SUPPORT_SESSION_IDLE_SECONDS", str(30 * 60)))
+    SUPPORT_SESSION_MAX_TURNS: int = int(os.getenv("SUPPORT_SESSION_MAX_TURNS", "6"))
+    SUPPORT_SESSION_KEEP_TURNS: int = int(os.getenv("SUPPORT_SESSION_KEEP_TURNS", "2"))
+    SUPPORT_SESSION_SUMMARY_CHARS: int = int(os.getenv("SUPPORT_SESSION_SUMMARY_CHARS", "1000"))
+
+    # Persistent LLM response cache (empty path disables it)
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+    LLM_CACHE_DEFAULT_TTL_SECONDS: float = float(os.getenv("LLM_CACHE_DEFAULT_TTL_SECONDS", str(60 * 60)))
+    LLM_CACHE_TTL_SECONDS = {
+        "search_external": float(os.getenv("LLM_CACHE_TTL_SEARCH_EXTERNAL", str(24 * 60 * 60))),
+        "recommend_external": float(os.getenv("LLM_CACHE_TTL_RECOMMEND_EXTERNAL", str(6 * 60 * 60))),
+        "support": float(os.getenv("LLM_CACHE_TTL_SUPPORT", str(60 * 60))),
+    }
+
+    # Trending counters
+    TRENDING_HALF_LIFE_SECONDS: float = float(os.getenv("TRENDING_HALF_LIFE_SECONDS", str(6 * 60 * 60)))
+    TRENDING_REFRESH_SECONDS: float = float(os.getenv("TRENDING_REFRESH_SECONDS", "5"))
+    TRENDING_FLUSH_SECONDS: float = float(os.getenv("TRENDING_FLUSH_SECONDS", "60"))
+    TRENDING_TOP_N: int = int(os.getenv("TRENDING_TOP_N", "50"))
+
+    # Transactional outbox dispatcher
+    OUTBOX_POLL_SECONDS: float = float(os.getenv("OUTBOX_POLL_SECONDS", "1"))
+    OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+    OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+    OUTBOX_RETENTION_SECONDS: float = float(os.getenv("OUTBOX_RETENTION_SECONDS", str(7 * 24 * 60 * 60)))
+    OUTBOX_PURGE_SECONDS: float = float(os.getenv("OUTBOX_PURGE_SECONDS", str(60 * 60)))
+
+    # Idempotency keys are replayable for the retention window, then purged
+    IDEMPOTENCY_KEY_RETENTION_SECONDS: float = float(os.getenv("IDEMPOTENCY_KEY_RETENTION_SECONDS", str(24 * 60 * 60)))
+    IDEMPOTENCY_KEY_PURGE_SECONDS: float = float(os.getenv("IDEMPOTENCY_KEY_PURGE_SECONDS", str(60 * 60)))
+
+    # Balance ledger rollup
+    LEDGER_ROLLUP_SECONDS: float = float(os.getenv("LEDGER_ROLLUP_SECONDS", "10"))
+    LEDGER_ROLLUP_BATCH_SIZE: int = int(os.getenv("LEDGER_ROLLUP_BATCH_SIZE", "1000"))
+
+    # Response compression (brotli and zstd are used when their packages are installed)
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # Bytes
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+    COMPRESSION_ZSTD_LEVEL: int = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+    COMPRESSION_CACHE_ENTRIES: int = int(os.getenv("COMPRESSION_CACHE_ENTRIES", "512"))
+    COMPRESSION_CACHE_MAX_BYTES: int = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+    # Conditional GETs and HTTP caching of dataset resources
+    DATASET_VERSION_CACHE_MAX_ENTRIES: int = int(os.getenv("DATASET_VERSION_CACHE_MAX_ENTRIES", "100000"))
+    DATASET_VERSION_CACHE_TTL_SECONDS: float = float(os.getenv("DATASET_VERSION_CACHE_TTL_SECONDS", "5"))
+    DATASET_DETAIL_MAX_AGE_SECONDS: int = int(os.getenv("DATASET_DETAIL_MAX_AGE_SECONDS", "30"))
+    DATASET_LIST_MAX_AGE_SECONDS: int = int(os.getenv("DATASET_LIST_MAX_AGE_SECONDS", "10"))
 
 
 settings = Settings()
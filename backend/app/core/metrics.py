@@ -0,0 +1,72 @@
+"""In-process metrics registry shared by agents and services."""
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Any
+import threading
+import time
+
+
+class MetricsRegistry:
+    """Thread-safe registry of counters, gauges and timing summaries."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> str:
+        if not labels:
+            return name
+        label_str = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+        return f"{name}{{{label_str}}}"
+
+    def incr(self, name: str, value: float = 1, **labels):
+        """Increment a counter."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] += value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """Set a gauge to an absolute value."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record a single observation (e.g. a latency in milliseconds)."""
+        key = self._key(name, labels)
+        with self._lock:
+            summary = self._timings.get(key)
+            if summary is None:
+                self._timings[key] = {"count": 1, "total": value, "max": value}
+            else:
+                summary["count"] += 1
+                summary["total"] += value
+                summary["max"] = max(summary["max"], value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Time the enclosed block and record it in milliseconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000, **labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a point-in-time copy of all metrics."""
+        with self._lock:
+            timings = {
+                key: {**summary, "avg": summary["total"] / summary["count"]}
+                for key, summary in self._timings.items()
+            }
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "timings": timings
+            }
+
+
+metrics = MetricsRegistry()
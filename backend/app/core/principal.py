@@ -0,0 +1,95 @@
+"""Authenticated principals and the per-worker cache of verified tokens."""
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Set, Tuple
+from pydantic import BaseModel
+from app.core.config import settings
+from app.core.metrics import metrics
+import hashlib
+import threading
+import time
+
+
+class Principal(BaseModel):
+    """The authenticated user, detached from any database session."""
+    id: int
+    email: str
+    username: Optional[str] = None
+    full_name: Optional[str] = None
+    avatar_url: Optional[str] = None
+    is_seller: Optional[bool] = False
+    is_active: Optional[bool] = True
+    balance: Optional[float] = 0.0
+    created_at: Optional[datetime] = None
+
+    model_config = {"from_attributes": True, "frozen": True}
+
+
+class PrincipalCache:
+    """
+    Bounded LRU of principals keyed on a hash of the bearer token.
+
+    An entry expires at the token's `exp` or `ttl_seconds` after it was cached,
+    whichever comes first. Changes to a user's balance or active flag must call
+    `invalidate_user` so the next request reloads them; other workers pick the
+    change up within the TTL.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # token hash -> (principal, expires_at)
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+
+    @staticmethod
+    def token_key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _remove(self, key: str):
+        principal, _ = self._entries.pop(key)
+        keys = self._by_user.get(principal.id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[principal.id]
+
+    def get(self, key: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.time():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                metrics.incr("auth.principal_cache.misses")
+                return None
+            self._entries.move_to_end(key)
+        metrics.incr("auth.principal_cache.hits")
+        return entry[0]
+
+    def put(self, key: str, principal: Principal, token_expires_at: Optional[float]):
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (principal, expires_at)
+            self._by_user.setdefault(principal.id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+            metrics.set_gauge("auth.principal_cache.entries", len(self._entries))
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached token of a user."""
+        with self._lock:
+            for key in list(self._by_user.get(user_id, ())):
+                self._remove(key)
+            metrics.set_gauge("auth.principal_cache.entries", len(self._entries))
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.AUTH_PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS
+)
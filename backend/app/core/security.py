@@ -1,11 +1,19 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Union, Any
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.metrics import metrics
+import asyncio
+import multiprocessing
 
+# The one password context; every hash and verify goes through it
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt is deliberately slow CPU work, so async code runs it in worker processes
+_password_pool: Optional[ProcessPoolExecutor] = None
+
 def create_access_token(subject: Union[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -16,8 +24,42 @@ def create_access_token(subject: Union[str, Any], expires_delta: Optional[timede
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+def verify_password(plain_password: str, hashed_password: Optional[str]) -> bool:
+    if not hashed_password:  # Accounts created through Google sign-in have no password
+        return False
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+def _get_password_pool() -> ProcessPoolExecutor:
+    global _password_pool
+    if _password_pool is None:
+        # spawn rather than fork: the API process already runs threads
+        _password_pool = ProcessPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _password_pool
+
+async def averify_password(plain_password: str, hashed_password: Optional[str]) -> bool:
+    """verify_password without blocking the event loop."""
+    if not hashed_password:
+        return False
+    with metrics.timer("auth.password_ms", op="verify"):
+        return await asyncio.get_running_loop().run_in_executor(
+            _get_password_pool(), verify_password, plain_password, hashed_password
+        )
+
+async def aget_password_hash(password: str) -> str:
+    """get_password_hash without blocking the event loop."""
+    with metrics.timer("auth.password_ms", op="hash"):
+        return await asyncio.get_running_loop().run_in_executor(
+            _get_password_pool(), get_password_hash, password
+        )
+
+def shutdown_password_pool():
+    global _password_pool
+    if _password_pool is not None:
+        _password_pool.shutdown(wait=False, cancel_futures=True)
+        _password_pool = None
@@ -4,7 +4,17 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.database import engine, Base
 from starlette.middleware.sessions import SessionMiddleware
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.compression import CompressionMiddleware
 from app.api import datasets, purchases, support, users, auth
+from app.core.security import shutdown_password_pool
+from app.services.background import register_periodic_task, start_background_tasks, stop_background_tasks
+from app.services.trending import trending_counters
+from app.agents.support_agent import support_faq
+from app.services.ledger import rollup_async
+from app.services import download_counters
+from app.services import events
+from app.services import idempotency
 
 # ... (logging config)
 
@@ -29,6 +39,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Response compression (outermost, so it sees the final headers)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    zstd_level=settings.COMPRESSION_ZSTD_LEVEL,
+    cache_entries=settings.COMPRESSION_CACHE_ENTRIES,
+    cache_max_bytes=settings.COMPRESSION_CACHE_MAX_BYTES,
+)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(datasets.router)
@@ -37,6 +58,30 @@ app.include_router(support.router)
 app.include_router(users.router)
 
 
+@app.on_event("startup")
+async def startup():
+    """Load persisted state and start background tasks."""
+    await trending_counters.load_async()
+    events.subscribe("purchase.completed", download_counters.handle_purchases)
+    events.subscribe("purchase.completed", trending_counters.handle_purchases)
+    register_periodic_task("trending_refresh", settings.TRENDING_REFRESH_SECONDS, trending_counters.refresh_async)
+    register_periodic_task("trending_flush", settings.TRENDING_FLUSH_SECONDS, trending_counters.flush_async, run_on_stop=True)
+    register_periodic_task("ledger_rollup", settings.LEDGER_ROLLUP_SECONDS, rollup_async, run_on_stop=True)
+    register_periodic_task("faq_reload", settings.SUPPORT_FAQ_RELOAD_SECONDS, support_faq.reload_async)
+    # Handlers write their effects in the dispatch transaction (see events.dispatch)
+    register_periodic_task("outbox_dispatch", settings.OUTBOX_POLL_SECONDS, events.dispatch_async, run_on_stop=True)
+    register_periodic_task("outbox_purge", settings.OUTBOX_PURGE_SECONDS, events.purge_async)
+    register_periodic_task("idempotency_purge", settings.IDEMPOTENCY_KEY_PURGE_SECONDS, idempotency.purge_async)
+    start_background_tasks()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop background tasks, flushing buffered state."""
+    await stop_background_tasks()
+    shutdown_password_pool()
+
+
 @app.get("/")
 async def root():
     """Root endpoint."""
@@ -53,6 +98,12 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """In-process metrics for this worker."""
+    return metrics.snapshot()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
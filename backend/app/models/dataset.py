@@ -1,7 +1,8 @@
 """Dataset model."""
-from sqlalchemy import Column, Integer, String, Float, Text, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, Text, DateTime, Boolean, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from typing import Iterable, List
+from sqlalchemy.sql import func, text
 from app.database import Base
 
 
@@ -29,11 +30,28 @@ class Dataset(Base):
     review_count = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Bumped on every change to the row; part of the ETag (migrations/002_dataset_version.sql)
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
 
     seller = relationship("User", back_populates="datasets")
     purchases = relationship("Purchase", back_populates="dataset")
 
 
+# Columns behind list views (cards, search results, recommendations). sample_data
+# and metadata are large JSON documents only the detail view shows, so list
+# queries leave them, and file_path, unloaded.
+DATASET_LIST_FIELDS = (
+    "id", "title", "description", "category", "tags", "price", "size_mb", "row_count",
+    "column_count", "format", "seller_id", "is_active", "download_count", "rating",
+    "review_count", "created_at", "updated_at"
+)
+
+
+def dataset_list_columns(fields: Iterable[str] = DATASET_LIST_FIELDS) -> List:
+    """Dataset attributes for load_only() in list queries; the id is always included."""
+    return [getattr(Dataset, name) for name in dict.fromkeys(("id", *fields))]
+
+
 class User(Base):
     """User model."""
     __tablename__ = "users"
@@ -57,6 +75,20 @@ class User(Base):
 class Purchase(Base):
     """Purchase transaction model."""
     __tablename__ = "purchases"
+    __table_args__ = (
+        # At most one completed purchase per buyer and dataset (migrations/001_purchase_indexes.sql)
+        Index(
+            "uq_purchases_buyer_dataset_completed", "buyer_id", "dataset_id",
+            unique=True,
+            postgresql_where=text("status = 'completed'"),
+            sqlite_where=text("status = 'completed'")
+        ),
+        # Covering index for a buyer's purchases, newest first
+        Index(
+            "ix_purchases_buyer_purchased_at", "buyer_id", text("purchased_at DESC"),
+            postgresql_include=["id", "dataset_id", "amount", "transaction_id", "status"]
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     buyer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -69,3 +101,63 @@ class Purchase(Base):
     buyer = relationship("User", back_populates="purchases")
     dataset = relationship("Dataset", back_populates="purchases")
 
+
+class DatasetTrending(Base):
+    """Exponentially decayed view and purchase scores per dataset."""
+    __tablename__ = "dataset_trending"
+
+    dataset_id = Column(Integer, ForeignKey("datasets.id"), primary_key=True)
+    view_score = Column(Float, nullable=False, default=0.0)
+    purchase_score = Column(Float, nullable=False, default=0.0)
+    scored_at = Column(Float, nullable=False)  # Unix time the scores were decayed to
+
+
+class LedgerEntry(Base):
+    """Immutable balance credit; folded into users.balance by the periodic rollup."""
+    __tablename__ = "ledger_entries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    amount = Column(Float, nullable=False)
+    kind = Column(String(50), nullable=False, default="sale")
+    transaction_id = Column(String(255), index=True)  # Purchase that produced the entry
+    rolled_up = Column(Boolean, nullable=False, default=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class IdempotencyKey(Base):
+    """Response of a request made with an Idempotency-Key header, replayed on retries."""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("ix_idempotency_keys_user_key", "user_id", "key", unique=True),
+        Index("ix_idempotency_keys_created_at", "created_at"),  # Retention purge
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String(255), nullable=False)
+    endpoint = Column(String(100), nullable=False)
+    request_hash = Column(String(64), nullable=False)  # Guards against reusing a key for a different request
+    status_code = Column(Integer)
+    response = Column(JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class OutboxEvent(Base):
+    """Event written in the same transaction as the change it describes, delivered by the outbox dispatcher."""
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # Undelivered events in id order, for the dispatcher's poll
+        Index(
+            "ix_outbox_events_pending", "id",
+            postgresql_where=text("dispatched_at IS NULL"),
+            sqlite_where=text("dispatched_at IS NULL")
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    topic = Column(String(100), nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(Float, nullable=False)  # Unix time, for delivery lag
+    attempts = Column(Integer, nullable=False, default=0)
+    dispatched_at = Column(Float, index=True)  # Unix time; NULL until delivered or given up on
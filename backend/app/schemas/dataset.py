@@ -50,6 +50,34 @@ class DatasetResponse(DatasetBase):
     model_config = {"from_attributes": True, "populate_by_name": True}
 
 
+class DatasetListItem(BaseModel):
+    """
+    Slim dataset schema for list views, without sample_data and metadata.
+    
+    Every field but the id is optional because sparse fieldsets (`fields=`)
+    return only the requested fields.
+    """
+    id: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+    category: Optional[str] = None
+    tags: Optional[List[str]] = None
+    price: Optional[float] = None
+    size_mb: Optional[float] = None
+    row_count: Optional[int] = None
+    column_count: Optional[int] = None
+    format: Optional[str] = None
+    seller_id: Optional[int] = None
+    is_active: Optional[bool] = None
+    download_count: Optional[int] = None
+    rating: Optional[float] = None
+    review_count: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    model_config = {"from_attributes": True}
+
+
 class DatasetSearch(BaseModel):
     """Schema for dataset search."""
     query: Optional[str] = None
@@ -101,3 +129,14 @@ class PurchaseResponse(BaseModel):
 
     model_config = {"from_attributes": True}
 
+
+class CheckoutCreate(BaseModel):
+    """Schema for buying several datasets at once."""
+    dataset_ids: List[int] = Field(..., min_length=1, max_length=100)
+
+
+class CheckoutResponse(BaseModel):
+    """Schema for checkout response."""
+    purchases: List[PurchaseResponse]
+    total_amount: float
+
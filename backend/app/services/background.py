@@ -0,0 +1,78 @@
+"""Periodic background tasks that run for the lifetime of the application."""
+from typing import Awaitable, Callable, List, Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """Runs an async callable every `interval` seconds until stopped."""
+
+    def __init__(
+        self,
+        name: str,
+        interval: float,
+        func: Callable[[], Awaitable[None]],
+        run_on_stop: bool = False
+    ):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.run_on_stop = run_on_stop
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.func()
+            except Exception as e:
+                logger.error(f"Background task '{self.name}' failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.run_on_stop:
+            try:
+                await self.func()
+            except Exception as e:
+                logger.error(f"Final run of background task '{self.name}' failed: {e}")
+
+
+_tasks: List[PeriodicTask] = []
+
+
+def register_periodic_task(
+    name: str,
+    interval: float,
+    func: Callable[[], Awaitable[None]],
+    run_on_stop: bool = False
+) -> PeriodicTask:
+    """Register a task to be started with the application."""
+    task = PeriodicTask(name, interval, func, run_on_stop=run_on_stop)
+    _tasks.append(task)
+    return task
+
+
+def start_background_tasks():
+    """Start every registered task on the running event loop."""
+    for task in _tasks:
+        task.start()
+        logger.info(f"Started background task '{task.name}' (every {task.interval}s)")
+
+
+async def stop_background_tasks():
+    """Stop every registered task, running final flushes where requested."""
+    for task in reversed(_tasks):
+        await task.stop()
+    _tasks.clear()
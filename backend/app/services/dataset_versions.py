@@ -0,0 +1,58 @@
+"""Per-worker map of dataset versions for conditional GETs."""
+from collections import OrderedDict
+from typing import Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import metrics
+import threading
+import time
+
+
+class DatasetVersions:
+    """
+    Bounded LRU of dataset id -> version.
+
+    Lets `If-None-Match` on a dataset be answered without loading the row.
+    Writes in this worker call `put` or `invalidate`; other workers see a
+    change within `ttl_seconds`, so a revalidation may answer 304 for up to
+    that long after another worker changed the dataset.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # dataset id -> (version, expires_at)
+        self._entries: "OrderedDict[int, Tuple[int, float]]" = OrderedDict()
+
+    def get(self, dataset_id: int) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(dataset_id)
+            if entry is not None and entry[1] <= time.time():
+                del self._entries[dataset_id]
+                entry = None
+            if entry is None:
+                metrics.incr("dataset_versions.misses")
+                return None
+            self._entries.move_to_end(dataset_id)
+        metrics.incr("dataset_versions.hits")
+        return entry[0]
+
+    def put(self, dataset_id: int, version: int):
+        with self._lock:
+            self._entries.pop(dataset_id, None)
+            self._entries[dataset_id] = (version, time.time() + self.ttl_seconds)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            metrics.set_gauge("dataset_versions.entries", len(self._entries))
+
+    def invalidate(self, *dataset_ids: int):
+        with self._lock:
+            for dataset_id in dataset_ids:
+                self._entries.pop(dataset_id, None)
+            metrics.set_gauge("dataset_versions.entries", len(self._entries))
+
+
+dataset_versions = DatasetVersions(
+    max_entries=settings.DATASET_VERSION_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.DATASET_VERSION_CACHE_TTL_SECONDS
+)
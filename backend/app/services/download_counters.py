@@ -0,0 +1,38 @@
+"""Dataset download counters, applied by the outbox dispatcher."""
+from typing import Any, Dict, List
+from sqlalchemy import bindparam, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.metrics import metrics
+from app.models.dataset import Dataset
+from app.services.dataset_versions import dataset_versions
+
+
+async def handle_purchases(db: AsyncSession, events: List[Dict[str, Any]]):
+    """
+    Outbox handler for purchase.completed events.
+
+    Purchases never update the dataset row themselves, so bestsellers are not a
+    lock hotspot on the purchase path. Each dispatched batch is applied as one
+    `download_count = download_count + n` update per dataset, in the dispatch
+    transaction, so the counts and the events' dispatched marks commit together.
+    """
+    counts: Dict[int, int] = {}
+    for event in events:
+        counts[event["dataset_id"]] = counts.get(event["dataset_id"], 0) + 1
+
+    table = Dataset.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(
+            download_count=table.c.download_count + bindparam("b_count"),
+            version=table.c.version + 1
+        )
+    )
+    # In id order so concurrent dispatchers cannot deadlock
+    await db.execute(stmt, [
+        {"b_id": dataset_id, "b_count": counts[dataset_id]} for dataset_id in sorted(counts)
+    ])
+    dataset_versions.invalidate(*counts)
+    metrics.incr("download_counters.updated_datasets", len(counts))
+    metrics.incr("download_counters.downloads", len(events))
@@ -0,0 +1,135 @@
+"""Transactional outbox and in-process event bus."""
+from typing import Any, Awaitable, Callable, Dict, List
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.database import AsyncSessionLocal
+from app.models.dataset import OutboxEvent
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Handlers receive the dispatch session and a batch of event payloads for the
+# topic they subscribed to; they write their effects without committing
+Handler = Callable[[AsyncSession, List[Dict[str, Any]]], Awaitable[None]]
+
+_handlers: Dict[str, List[Handler]] = {}
+
+
+def subscribe(topic: str, handler: Handler):
+    """Register an async handler for a topic."""
+    _handlers.setdefault(topic, []).append(handler)
+
+
+async def publish(db: AsyncSession, topic: str, payloads: List[Dict[str, Any]]):
+    """
+    Write events to the outbox in the current transaction.
+
+    They are delivered only if the transaction commits, and the writer never
+    waits on the handlers.
+    """
+    now = time.time()
+    await db.execute(insert(OutboxEvent), [
+        {"topic": topic, "payload": payload, "created_at": now, "attempts": 0}
+        for payload in payloads
+    ])
+
+
+async def dispatch(db: AsyncSession, batch_size: int, max_attempts: int) -> int:
+    """
+    Deliver one batch of pending events and return how many were settled.
+
+    Handlers write their effects in a savepoint of the dispatch transaction, so
+    the effects and the events' dispatched marks commit together: an event's
+    effect is applied exactly once, and nothing is lost between delivery and a
+    later flush. If any handler of a topic fails, that topic's savepoint is
+    rolled back and its batch is retried on the next poll; events that keep
+    failing are given up on after `max_attempts`. Locked rows are skipped, so
+    several workers can dispatch concurrently.
+    """
+    result = await db.execute(
+        select(OutboxEvent.id, OutboxEvent.topic, OutboxEvent.payload, OutboxEvent.created_at, OutboxEvent.attempts)
+        .where(OutboxEvent.dispatched_at.is_(None))
+        .order_by(OutboxEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    rows = result.all()
+    if not rows:
+        metrics.set_gauge("outbox.lag_seconds", 0.0)
+        return 0
+
+    now = time.time()
+    metrics.set_gauge("outbox.lag_seconds", now - rows[0].created_at)
+
+    by_topic: Dict[str, List[Any]] = {}
+    for row in rows:
+        by_topic.setdefault(row.topic, []).append(row)
+
+    settled = 0
+    try:
+        for topic, topic_rows in by_topic.items():
+            payloads = [row.payload for row in topic_rows]
+            failed = False
+            try:
+                async with db.begin_nested():
+                    for handler in _handlers.get(topic, []):
+                        with metrics.timer("outbox.handler_ms", topic=topic):
+                            await handler(db, payloads)
+            except Exception as e:
+                failed = True
+                metrics.incr("outbox.handler_errors", topic=topic)
+                logger.error(f"Outbox handlers failed for '{topic}': {e}")
+
+            done_at = time.time()
+            if failed:
+                retry = [row.id for row in topic_rows if row.attempts + 1 < max_attempts]
+                given_up = [row.id for row in topic_rows if row.attempts + 1 >= max_attempts]
+                if given_up:
+                    metrics.incr("outbox.dead_letters", len(given_up), topic=topic)
+                    logger.error(f"Giving up on outbox events {given_up} ('{topic}') after {max_attempts} attempts")
+            else:
+                retry, given_up = [], [row.id for row in topic_rows]
+                metrics.incr("outbox.dispatched", len(topic_rows), topic=topic)
+                for row in topic_rows:
+                    metrics.observe("outbox.delivery_lag_ms", (done_at - row.created_at) * 1000, topic=topic)
+
+            if retry:
+                await db.execute(
+                    update(OutboxEvent).where(OutboxEvent.id.in_(retry))
+                    .values(attempts=OutboxEvent.attempts + 1)
+                )
+            if given_up:
+                await db.execute(
+                    update(OutboxEvent).where(OutboxEvent.id.in_(given_up))
+                    .values(attempts=OutboxEvent.attempts + 1, dispatched_at=done_at)
+                )
+                settled += len(given_up)
+
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return settled
+
+
+async def purge(db: AsyncSession, older_than_seconds: float):
+    """Delete events dispatched more than `older_than_seconds` ago."""
+    await db.execute(
+        delete(OutboxEvent).where(OutboxEvent.dispatched_at < time.time() - older_than_seconds)
+    )
+    await db.commit()
+
+
+async def dispatch_async():
+    """Deliver pending events until the outbox is drained."""
+    async with AsyncSessionLocal() as db:
+        while await dispatch(db, settings.OUTBOX_BATCH_SIZE, settings.OUTBOX_MAX_ATTEMPTS) == settings.OUTBOX_BATCH_SIZE:
+            pass
+
+
+async def purge_async():
+    async with AsyncSessionLocal() as db:
+        await purge(db, settings.OUTBOX_RETENTION_SECONDS)
@@ -0,0 +1,81 @@
+"""Idempotency keys for retry-safe writes."""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.database import AsyncSessionLocal
+from app.models.dataset import IdempotencyKey
+import hashlib
+import json
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a different request."""
+
+
+def request_hash(endpoint: str, params: Dict[str, Any]) -> str:
+    payload = json.dumps({"endpoint": endpoint, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def lookup(db: AsyncSession, user_id: int, key: str, fingerprint: str) -> Optional[IdempotencyKey]:
+    """Return the stored record for a completed request with this key, if any."""
+    result = await db.execute(
+        select(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    )
+    record = result.scalar_one_or_none()
+    if record is not None and record.request_hash != fingerprint:
+        raise IdempotencyConflict(key)
+    return record
+
+
+async def claim(
+    db: AsyncSession,
+    user_id: int,
+    key: str,
+    endpoint: str,
+    fingerprint: str
+) -> IdempotencyKey:
+    """
+    Reserve the key inside the current transaction.
+
+    Returns a new record with no `status_code`; the caller does its work and
+    calls `complete` before committing, so the key, the work and the stored
+    response commit or roll back together. If another request holds the key,
+    the unique index makes this wait for it, then the transaction is rolled
+    back and that request's stored record is returned instead.
+    """
+    record = IdempotencyKey(user_id=user_id, key=key, endpoint=endpoint, request_hash=fingerprint)
+    db.add(record)
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        metrics.incr("idempotency.conflicts", endpoint=endpoint)
+        stored = await lookup(db, user_id, key, fingerprint)
+        if stored is None:
+            raise
+        return stored
+    return record
+
+
+def complete(record: IdempotencyKey, status_code: int, response: Any):
+    """Store the response on a record reserved by `claim`; it commits with the caller's transaction."""
+    record.status_code = status_code
+    record.response = response
+
+
+async def purge(db: AsyncSession, older_than_seconds: float):
+    """Delete keys created more than `older_than_seconds` ago; retries after that are new requests."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=older_than_seconds)
+    result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff))
+    await db.commit()
+    metrics.incr("idempotency.purged", result.rowcount)
+
+
+async def purge_async():
+    async with AsyncSessionLocal() as db:
+        await purge(db, settings.IDEMPOTENCY_KEY_RETENTION_SECONDS)
@@ -0,0 +1,111 @@
+"""Append-only balance ledger with periodic rollups into users.balance."""
+from typing import Dict, List, Tuple, Union
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.principal import Principal, principal_cache
+from app.database import AsyncSessionLocal
+from app.models.dataset import LedgerEntry, User
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def credit(db: AsyncSession, user_id: int, amount: float, transaction_id: str, kind: str = "sale"):
+    """
+    Record a credit to a user's balance in the current transaction.
+
+    This is a plain insert, so any number of concurrent purchases can credit the
+    same seller without contending on their `users` row.
+    """
+    db.add(LedgerEntry(user_id=user_id, amount=amount, kind=kind, transaction_id=transaction_id))
+
+
+async def credit_many(db: AsyncSession, credits: List[Tuple[int, float, str]], kind: str = "sale"):
+    """Record (user_id, amount, transaction_id) credits with a single bulk insert."""
+    await db.execute(insert(LedgerEntry), [
+        {"user_id": user_id, "amount": amount, "kind": kind, "transaction_id": transaction_id, "rolled_up": False}
+        for user_id, amount, transaction_id in credits
+    ])
+
+
+def unrolled_total(user_id: int):
+    """Scalar subquery summing the credits not yet folded into the user's stored balance."""
+    return select(func.coalesce(func.sum(LedgerEntry.amount), 0.0)).where(
+        LedgerEntry.user_id == user_id,
+        LedgerEntry.rolled_up == False
+    ).scalar_subquery()
+
+
+async def effective_balance(db: AsyncSession, user: Union[User, Principal]) -> float:
+    """
+    Stored balance plus the unrolled ledger tail.
+
+    This is the spendable balance: purchases debit against the same sum, so
+    sale proceeds can be spent before the rollup folds them in. Both parts are
+    read in one statement, so a concurrent rollup is never counted twice and a
+    cached principal's stale balance is not used.
+    """
+    result = await db.execute(
+        select(func.coalesce(User.balance, 0.0) + unrolled_total(user.id)).where(User.id == user.id)
+    )
+    return float(result.scalar_one_or_none() or 0.0)
+
+
+async def rollup(db: AsyncSession, batch_size: int) -> int:
+    """
+    Fold a batch of unrolled entries into users.balance.
+
+    The balance updates and the rolled_up flags commit together, so every entry
+    is counted exactly once. Locked entries are skipped, letting several workers
+    roll up concurrently without waiting on each other.
+    """
+    result = await db.execute(
+        select(LedgerEntry.id, LedgerEntry.user_id, LedgerEntry.amount, LedgerEntry.created_at)
+        .where(LedgerEntry.rolled_up == False)
+        .order_by(LedgerEntry.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    rows = result.all()
+    if not rows:
+        return 0
+
+    totals: Dict[int, float] = {}
+    for _, user_id, amount, _ in rows:
+        totals[user_id] = totals.get(user_id, 0.0) + amount
+
+    try:
+        # One update per user, in id order so concurrent rollups cannot deadlock
+        for user_id in sorted(totals):
+            await db.execute(
+                update(User)
+                .where(User.id == user_id)
+                .values(balance=User.balance + totals[user_id])
+            )
+        await db.execute(
+            update(LedgerEntry)
+            .where(LedgerEntry.id.in_([row[0] for row in rows]))
+            .values(rolled_up=True)
+        )
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    for user_id in totals:
+        principal_cache.invalidate_user(user_id)
+
+    oldest = rows[0][3]
+    if oldest is not None:
+        metrics.set_gauge("ledger.rollup_lag_seconds", max(0.0, time.time() - oldest.timestamp()))
+    metrics.incr("ledger.rolled_up_entries", len(rows))
+    return len(rows)
+
+
+async def rollup_async():
+    """Roll up until the backlog is drained."""
+    async with AsyncSessionLocal() as db:
+        while await rollup(db, settings.LEDGER_ROLLUP_BATCH_SIZE) == settings.LEDGER_ROLLUP_BATCH_SIZE:
+            pass
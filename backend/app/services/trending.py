@@ -0,0 +1,180 @@
+"""Time-decayed trending counters for datasets."""
+from typing import Any, Dict, Iterable, List, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.database import AsyncSessionLocal
+from app.models.dataset import DatasetTrending
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# (score, unix time the score was last decayed to)
+Counter = Tuple[float, float]
+
+
+class TrendingCounters:
+    """
+    Exponentially decayed view and purchase counters per dataset.
+
+    Views update in-memory counters and a per-worker delta buffer. Deltas are
+    periodically folded into the `dataset_trending` table (purchases are written
+    there directly by the outbox dispatcher), after which the
+    in-memory view is re-synced from it so every worker converges on the global
+    scores. The ranked top-N is precomputed on a short interval so reads never
+    sort on the request path.
+    """
+
+    PURCHASE_WEIGHT = 5.0
+    VIEW_WEIGHT = 1.0
+
+    def __init__(self, half_life_seconds: float, top_n: int):
+        self.top_n = top_n
+        self._decay_rate = math.log(2) / half_life_seconds
+        self._lock = threading.Lock()
+        self._views: Dict[int, Counter] = {}
+        self._purchases: Dict[int, Counter] = {}
+        self._pending_views: Dict[int, Counter] = {}
+        self._top: List[int] = []
+
+    def _decayed(self, value: float, scored_at: float, now: float) -> float:
+        return value * math.exp(-self._decay_rate * max(0.0, now - scored_at))
+
+    def _bump(self, counters: Dict[int, Counter], dataset_id: int, amount: float, now: float):
+        value, scored_at = counters.get(dataset_id, (0.0, now))
+        counters[dataset_id] = (self._decayed(value, scored_at, now) + amount, now)
+
+    def record_view(self, dataset_id: int):
+        """Count a dataset detail view."""
+        now = time.time()
+        with self._lock:
+            self._bump(self._views, dataset_id, 1.0, now)
+            self._bump(self._pending_views, dataset_id, 1.0, now)
+
+    async def handle_purchases(self, db: AsyncSession, events: List[Dict[str, Any]]):
+        """
+        Outbox handler for purchase.completed events.
+
+        The purchase scores are folded into the table in the dispatch transaction,
+        so they commit together with the events' dispatched marks instead of
+        waiting in a per-worker buffer. This worker's in-memory view is bumped
+        too; the next `load` corrects it if the transaction rolls back.
+        """
+        now = time.time()
+        purchases: Dict[int, Counter] = {}
+        for event in events:
+            self._bump(purchases, event["dataset_id"], 1.0, now)
+        await self._apply_deltas(db, {}, purchases, now)
+        with self._lock:
+            for dataset_id, (value, _) in purchases.items():
+                self._bump(self._purchases, dataset_id, value, now)
+
+    def _score(self, dataset_id: int, now: float) -> float:
+        views = self._decayed(*self._views.get(dataset_id, (0.0, now)), now)
+        purchases = self._decayed(*self._purchases.get(dataset_id, (0.0, now)), now)
+        return self.VIEW_WEIGHT * views + self.PURCHASE_WEIGHT * purchases
+
+    def refresh(self):
+        """Recompute the precomputed top-N ranking."""
+        now = time.time()
+        with self._lock:
+            scored = [
+                (dataset_id, self._score(dataset_id, now))
+                for dataset_id in set(self._views) | set(self._purchases)
+            ]
+        scored = [item for item in scored if item[1] > 0.0]
+        scored.sort(key=lambda x: x[1], reverse=True)
+        self._top = [dataset_id for dataset_id, _ in scored[:self.top_n]]
+        metrics.set_gauge("trending.tracked_datasets", len(scored))
+
+    def top(self, limit: int, exclude: Iterable[int] = ()) -> List[int]:
+        """Return up to `limit` trending dataset IDs, skipping `exclude`."""
+        excluded = set(exclude)
+        return [dataset_id for dataset_id in self._top if dataset_id not in excluded][:limit]
+
+    async def load(self, db: AsyncSession):
+        """Replace the in-memory scores with the table, keeping unflushed views."""
+        result = await db.execute(select(DatasetTrending))
+        rows = result.scalars().all()
+        now = time.time()
+        with self._lock:
+            self._views = {row.dataset_id: (row.view_score, row.scored_at) for row in rows}
+            self._purchases = {row.dataset_id: (row.purchase_score, row.scored_at) for row in rows}
+            for dataset_id, (value, scored_at) in self._pending_views.items():
+                self._bump(self._views, dataset_id, self._decayed(value, scored_at, now), now)
+        self.refresh()
+
+    async def flush(self, db: AsyncSession):
+        """Fold buffered view deltas into the table, then re-sync from it."""
+        with self._lock:
+            views, self._pending_views = self._pending_views, {}
+
+        if views:
+            now = time.time()
+            try:
+                await self._apply_deltas(db, views, {}, now)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                # Put the deltas back so the next flush retries them
+                with self._lock:
+                    for dataset_id, (value, scored_at) in views.items():
+                        self._bump(self._pending_views, dataset_id, self._decayed(value, scored_at, now), now)
+                raise
+            metrics.incr("trending.flushed_datasets", len(views))
+
+        await self.load(db)
+
+    async def _apply_deltas(
+        self,
+        db: AsyncSession,
+        views: Dict[int, Counter],
+        purchases: Dict[int, Counter],
+        now: float
+    ):
+        """Add decayed deltas to the table rows in the current transaction."""
+        dataset_ids = sorted(set(views) | set(purchases))
+        result = await db.execute(
+            select(DatasetTrending).where(
+                DatasetTrending.dataset_id.in_(dataset_ids)
+            ).order_by(DatasetTrending.dataset_id).with_for_update()
+            # The dispatcher reuses its session across batches; never add to stale scores
+            .execution_options(populate_existing=True)
+        )
+        by_id = {row.dataset_id: row for row in result.scalars().all()}
+        for dataset_id in dataset_ids:
+            view_delta = self._decayed(*views.get(dataset_id, (0.0, now)), now)
+            purchase_delta = self._decayed(*purchases.get(dataset_id, (0.0, now)), now)
+            row = by_id.get(dataset_id)
+            if row is None:
+                db.add(DatasetTrending(
+                    dataset_id=dataset_id,
+                    view_score=view_delta,
+                    purchase_score=purchase_delta,
+                    scored_at=now
+                ))
+            else:
+                row.view_score = self._decayed(row.view_score, row.scored_at, now) + view_delta
+                row.purchase_score = self._decayed(row.purchase_score, row.scored_at, now) + purchase_delta
+                row.scored_at = now
+
+    async def load_async(self):
+        async with AsyncSessionLocal() as db:
+            await self.load(db)
+
+    async def flush_async(self):
+        async with AsyncSessionLocal() as db:
+            await self.flush(db)
+
+    async def refresh_async(self):
+        self.refresh()
+
+
+trending_counters = TrendingCounters(
+    half_life_seconds=settings.TRENDING_HALF_LIFE_SECONDS,
+    top_n=settings.TRENDING_TOP_N
+)
@@ -0,0 +1,21 @@
+-- Purchase indexes for databases created before they were declared on the model.
+-- New databases get them from Base.metadata.create_all on startup.
+--
+-- Run outside a transaction block (CREATE INDEX CONCURRENTLY), e.g.:
+--   psql "$DATABASE_URL" -f migrations/001_purchase_indexes.sql
+--
+-- The unique index fails to build if a buyer already has two completed
+-- purchases of the same dataset; find them first with:
+--   SELECT buyer_id, dataset_id, count(*) FROM purchases
+--   WHERE status = 'completed' GROUP BY buyer_id, dataset_id HAVING count(*) > 1;
+
+-- At most one completed purchase per buyer and dataset; the purchase path
+-- relies on it instead of checking for an existing purchase first.
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_purchases_buyer_dataset_completed
+    ON purchases (buyer_id, dataset_id)
+    WHERE status = 'completed';
+
+-- Serves /api/purchases/mine (newest first) from the index alone.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_purchases_buyer_purchased_at
+    ON purchases (buyer_id, purchased_at DESC)
+    INCLUDE (id, dataset_id, amount, transaction_id, status);
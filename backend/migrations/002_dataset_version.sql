@@ -0,0 +1,9 @@
+-- Dataset version counter for databases created before it was declared on the model.
+-- New databases get it from Base.metadata.create_all on startup.
+--
+--   psql "$DATABASE_URL" -f migrations/002_dataset_version.sql
+--
+-- On PostgreSQL 11+ adding a column with a constant default does not rewrite the table.
+
+-- Bumped on every change to a dataset row; dataset ETags are derived from it.
+ALTER TABLE datasets ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
@@ -0,0 +1,10 @@
+-- Index for the idempotency key retention purge, for databases created before
+-- it was declared on the model. New databases get it from Base.metadata.create_all.
+--
+-- Run outside a transaction block (CREATE INDEX CONCURRENTLY), e.g.:
+--   psql "$DATABASE_URL" -f migrations/003_idempotency_key_created_at.sql
+
+-- The "idempotency_purge" background task deletes keys older than
+-- IDEMPOTENCY_KEY_RETENTION_SECONDS by created_at.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_idempotency_keys_created_at
+    ON idempotency_keys (created_at);
@@ -1,15 +1,13 @@
 """Script to seed verified datasets for development."""
 from app.database import SessionLocal, engine, Base
 from app.models.dataset import User, Dataset
-from passlib.context import CryptContext
+from app.core.security import get_password_hash
 import random
 from copy import deepcopy
 
 # Ensure tables exist when script is executed standalone
 Base.metadata.create_all(bind=engine)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 
 def seed_data():
     db = SessionLocal()
@@ -21,7 +19,7 @@ def seed_data():
             buyer = User(
                 email="buyer@example.com",
                 username="buyer",
-                hashed_password=pwd_context.hash("password123"),
+                hashed_password=get_password_hash("password123"),
                 full_name="John Buyer",
                 balance=1000.0
             )
@@ -32,7 +30,7 @@ def seed_data():
             seller = User(
                 email="seller@example.com",
                 username="seller",
-                hashed_password=pwd_context.hash("password123"),
+                hashed_password=get_password_hash("password123"),
                 full_name="Jane Seller",
                 is_seller=True,
                 balance=0.0
@@ -0,0 +1,91 @@
+"""
+Mixed read/write throughput: synchronous sessions in async handlers vs the async engine.
+
+The "sync" variant reproduces the old setup, with `async def` handlers issuing
+blocking queries on the event loop. The "async" variant uses AsyncSession as
+the API does now. Each runs CONCURRENCY request loops for DURATION seconds,
+80% list reads and 20% counter writes. Run against a disposable database
+(see tests/marketplace.py):
+
+    TEST_ASYNC_DATABASE_URL=postgresql+asyncpg://... python -m tests.bench_async_db
+"""
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from app.models.dataset import Dataset, dataset_list_columns
+from tests import marketplace
+import asyncio
+import random
+import time
+
+CONCURRENCY = 50
+DURATION = 10.0
+READ_RATIO = 0.8
+
+
+def _list_query():
+    return select(*dataset_list_columns()).where(Dataset.is_active == True).limit(20)
+
+
+def _write_query(dataset_ids):
+    return (
+        update(Dataset)
+        .where(Dataset.id == random.choice(dataset_ids))
+        .values(download_count=Dataset.download_count + 1)
+    )
+
+
+async def _drive(request, label: str):
+    latencies = []
+    deadline = time.perf_counter() + DURATION
+
+    async def loop():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await request(random.random() < READ_RATIO)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(loop() for _ in range(CONCURRENCY)))
+    latencies.sort()
+    print(
+        f"{label:>5}: {len(latencies) / DURATION:8.1f} req/s  "
+        f"p50 {latencies[len(latencies) // 2] * 1000:7.1f} ms  "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.1f} ms"
+    )
+
+
+async def scenario(sessions: async_sessionmaker):
+    seed = await marketplace.seed(sessions, buyer_balance=0.0, dataset_count=500)
+    dataset_ids = seed["dataset_ids"]
+
+    sync_engine = create_engine(
+        marketplace.TEST_ASYNC_DATABASE_URL.replace("+asyncpg", ""), pool_size=CONCURRENCY, max_overflow=0
+    )
+    sync_sessions = sessionmaker(sync_engine)
+
+    async def sync_request(read: bool):
+        # Blocking calls inside a coroutine, as the handlers used to do
+        with sync_sessions() as db:
+            if read:
+                db.execute(_list_query()).all()
+            else:
+                db.execute(_write_query(dataset_ids))
+                db.commit()
+
+    async def async_request(read: bool):
+        async with sessions() as db:
+            if read:
+                (await db.execute(_list_query())).all()
+            else:
+                await db.execute(_write_query(dataset_ids))
+                await db.commit()
+
+    try:
+        await _drive(sync_request, "sync")
+        await _drive(async_request, "async")
+    finally:
+        sync_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(marketplace.run(scenario, pool_size=CONCURRENCY))
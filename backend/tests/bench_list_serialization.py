@@ -0,0 +1,67 @@
+"""
+Serialization time per 100 datasets for the list endpoints, before and after.
+
+"before" is the old search/recommendations path: `DatasetResponse.model_validate`
+per ORM object, then `jsonable_encoder` and `json.dumps` as FastAPI applied them
+to the returned dict (its extra validation against `response_model=dict` is
+left out, so "before" is a lower bound). "after" is the current path:
+`_project` onto the list fields and one `ORJSONResponse` encode. Datasets are
+built in memory, so no database is needed:
+
+    python -m tests.bench_list_serialization
+"""
+from datetime import datetime, timezone
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.api.datasets import _json, _project
+from app.models.dataset import DATASET_LIST_FIELDS, Dataset
+from app.schemas.dataset import DatasetResponse
+import time
+
+PAGE = 100
+ROUNDS = 200
+
+
+def _datasets():
+    now = datetime.now(timezone.utc)
+    return [
+        Dataset(
+            id=n, title=f"Dataset {n}", description="Hourly sensor readings from a fleet of weather stations. " * 4,
+            category="climate", tags=["weather", "sensors", "time-series"], price=19.99, size_mb=512.0,
+            row_count=1_000_000, column_count=12, format="Parquet",
+            sample_data={"rows": [{"station": n, "temp_c": 21.5, "humidity": 0.4}] * 5},
+            metadata_json={"license": "CC-BY-4.0", "source": "stations"}, seller_id=1, is_active=True,
+            download_count=n * 3, rating=4.5, review_count=n, created_at=now, updated_at=now
+        )
+        for n in range(PAGE)
+    ]
+
+
+def before(datasets):
+    content = {
+        "datasets": [DatasetResponse.model_validate(d) for d in datasets],
+        "external_datasets": [], "total": PAGE, "page": 1, "page_size": PAGE
+    }
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def after(datasets):
+    return _json({
+        "datasets": _project(datasets, DATASET_LIST_FIELDS),
+        "external_datasets": [], "total": PAGE, "page": 1, "page_size": PAGE
+    }, "bench").body
+
+
+def main():
+    datasets = _datasets()
+    for label, serialize in (("before", before), ("after", after)):
+        serialize(datasets)  # Warm up pydantic and orjson
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            body = serialize(datasets)
+        per_page = (time.perf_counter() - start) / ROUNDS
+        print(f"{label:>6}: {per_page * 1000:7.3f} ms per {PAGE} datasets  ({len(body)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
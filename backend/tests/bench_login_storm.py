@@ -0,0 +1,71 @@
+"""
+Event loop responsiveness during a login storm: bcrypt on the loop vs the password pool.
+
+Logins arrive at RATE per second for DURATION seconds. The "inline" variant
+verifies passwords with `verify_password` inside the coroutine, as the
+handlers used to; the "pool" variant awaits `averify_password`, which runs
+bcrypt in the shared process pool. Meanwhile a probe stands in for every other
+endpoint: it wakes every PROBE_INTERVAL seconds and records how late it ran.
+Needs no database:
+
+    python -m tests.bench_login_storm
+"""
+from app.core.security import averify_password, get_password_hash, shutdown_password_pool, verify_password
+import asyncio
+import time
+
+RATE = 100
+DURATION = 5.0
+PROBE_INTERVAL = 0.01
+
+
+async def _probe(stop: asyncio.Event, delays: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        delays.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+
+async def _storm(login, label: str):
+    stop = asyncio.Event()
+    delays: list = []
+    probe = asyncio.create_task(_probe(stop, delays))
+
+    start = time.perf_counter()
+    logins = []
+    for n in range(int(RATE * DURATION)):
+        # Open-loop arrivals: the next login starts on schedule whether or not earlier ones finished
+        await asyncio.sleep(max(0.0, start + n / RATE - time.perf_counter()))
+        logins.append(asyncio.create_task(login()))
+    await asyncio.gather(*logins)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+
+    delays.sort()
+    print(
+        f"{label:>6}: {len(logins) / elapsed:6.1f} logins/s  probe delay "
+        f"p50 {delays[len(delays) // 2] * 1000:7.1f} ms  "
+        f"p99 {delays[int(len(delays) * 0.99)] * 1000:7.1f} ms  "
+        f"max {delays[-1] * 1000:7.1f} ms"
+    )
+
+
+async def main():
+    hashed = get_password_hash("correct horse battery staple")
+
+    async def inline_login():
+        assert verify_password("correct horse battery staple", hashed)
+
+    async def pool_login():
+        assert await averify_password("correct horse battery staple", hashed)
+
+    await _storm(inline_login, "inline")
+    await _storm(pool_login, "pool")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    finally:
+        shutdown_password_pool()
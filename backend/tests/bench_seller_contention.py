@@ -0,0 +1,52 @@
+"""
+Purchase throughput for many concurrent buyers of one seller.
+
+Sales credit the seller through ledger inserts, so throughput should grow with
+the number of concurrent buyers instead of flattening on the seller's `users`
+row lock. Each level uses its own buyers, who between them buy every dataset
+once. Run against a disposable database (see tests/marketplace.py):
+
+    TEST_ASYNC_DATABASE_URL=postgresql+asyncpg://... python -m tests.bench_seller_contention
+"""
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from tests import marketplace
+import asyncio
+import time
+
+LEVELS = (1, 5, 10, 25, 50)
+PURCHASES_PER_LEVEL = 500
+
+
+async def scenario(sessions: async_sessionmaker):
+    seed = await marketplace.seed(
+        sessions, buyer_balance=PURCHASES_PER_LEVEL * marketplace.PRICE,
+        dataset_count=PURCHASES_PER_LEVEL, buyer_count=sum(LEVELS)
+    )
+    buyer_ids = iter(seed["buyer_ids"])
+
+    for level in LEVELS:
+        pending = iter(seed["dataset_ids"])
+        failures = 0
+
+        async def buyer(buyer_id: int):
+            nonlocal failures
+            # Iterators are shared, so the buyers of a level split the datasets between them
+            for dataset_id in pending:
+                result = await marketplace.call(sessions, {"user_id": buyer_id, "dataset_id": dataset_id})
+                if result.get("status") != "completed":
+                    failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(buyer(next(buyer_ids)) for _ in range(level)))
+        elapsed = time.perf_counter() - start
+        print(
+            f"{level:>3} buyers: {PURCHASES_PER_LEVEL / elapsed:8.1f} purchases/s  "
+            f"({failures} failed)"
+        )
+
+    state = await marketplace.state(sessions, seed["buyer_id"], seed["seller_id"])
+    print(f"seller credits: {state['seller_credits']:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(marketplace.run(scenario, pool_size=max(LEVELS)))
@@ -0,0 +1,57 @@
+"""
+Load test: slow LLM calls must not stall other requests on the worker.
+
+Support queries are answered by the local fake model (LLM_FAKE_PROVIDER) with
+a fixed per-token delay, so each one holds a Gemini pool thread for seconds.
+Purchase latency is measured before and while 50 of them are in flight.
+"""
+from statistics import median
+from typing import List
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.agents.gemini_utils import GeminiClient
+from app.agents.support_agent import SupportAgent
+from app.core.config import settings
+from tests import marketplace
+import asyncio
+import time
+import uuid
+
+pytestmark = marketplace.requires_postgres
+
+
+async def _timed_purchases(sessions: async_sessionmaker, buyer_id: int, dataset_ids: List[int]) -> List[float]:
+    latencies = []
+    for dataset_id in dataset_ids:
+        start = time.perf_counter()
+        result = await marketplace.call(sessions, {"user_id": buyer_id, "dataset_id": dataset_id})
+        latencies.append(time.perf_counter() - start)
+        assert result["status"] == "completed"
+    return latencies
+
+
+def test_purchase_latency_is_flat_while_slow_support_queries_run(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_FAKE_PROVIDER", True)
+    monkeypatch.setattr(settings, "LLM_FAKE_TOKEN_LATENCY_MS", 50.0)
+    monkeypatch.setattr(GeminiClient, "_model", None)
+
+    async def scenario(sessions: async_sessionmaker):
+        seed = await marketplace.seed(sessions, buyer_balance=1000.0, dataset_count=60)
+        ids = seed["dataset_ids"]
+        baseline = await _timed_purchases(sessions, seed["buyer_id"], ids[:30])
+
+        agent = SupportAgent()
+        # Unique questions, so neither the FAQ nor any response cache answers them
+        support = [
+            asyncio.create_task(agent.process({"query": f"question {uuid.uuid4().hex} about licensing terms"}))
+            for _ in range(50)
+        ]
+        await asyncio.sleep(0.2)
+        loaded = await _timed_purchases(sessions, seed["buyer_id"], ids[30:])
+        assert not all(task.done() for task in support), "support queries finished before the measurement"
+        await asyncio.gather(*support)
+
+        # Purchases only wait on the database, never on the model threads
+        assert median(loaded) <= 2 * median(baseline) + 0.05
+        assert max(loaded) < 1.0
+
+    asyncio.run(marketplace.run(scenario))
@@ -0,0 +1,106 @@
+"""
+Concurrency tests for the purchase path.
+
+Hundreds of purchases and checkouts run in parallel, each on its own
+connection, and the resulting balances, ledger and purchase rows are checked.
+See tests/marketplace.py for the database they need.
+"""
+from typing import List
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.models.dataset import IdempotencyKey
+from tests import marketplace
+import asyncio
+import pytest
+
+pytestmark = marketplace.requires_postgres
+
+
+def test_parallel_purchases_never_overspend_or_double_buy():
+    buyer_start = 150.0
+
+    async def scenario(sessions: async_sessionmaker):
+        seed = await marketplace.seed(sessions, buyer_start, dataset_count=200)
+        # Every dataset is requested twice, and the balance covers only 150 of the 200
+        results = await asyncio.gather(*(
+            marketplace.call(sessions, {"user_id": seed["buyer_id"], "dataset_id": dataset_id})
+            for dataset_id in seed["dataset_ids"] * 2
+        ))
+
+        completed = [r for r in results if r.get("status") == "completed"]
+        errors = {r["error"] for r in results if r.get("status") == "failed"}
+        assert errors <= {"Dataset already purchased", "Insufficient balance"}
+
+        state = await marketplace.state(sessions, seed["buyer_id"], seed["seller_id"])
+        marketplace.assert_consistent(state, buyer_start)
+        assert len(completed) == len(state["purchased"]) == int(buyer_start / marketplace.PRICE)
+        assert state["buyer_balance"] == pytest.approx(0.0)
+
+    asyncio.run(marketplace.run(scenario))
+
+
+def test_parallel_checkouts_are_all_or_nothing():
+    buyer_start = 120.0
+
+    async def scenario(sessions: async_sessionmaker):
+        seed = await marketplace.seed(sessions, buyer_start, dataset_count=100)
+        ids = seed["dataset_ids"]
+        # Overlapping baskets of five, so checkouts race on the same datasets
+        baskets: List[List[int]] = [[ids[(start + n) % len(ids)] for n in range(5)] for start in range(0, 200, 2)]
+        results = await asyncio.gather(*(
+            marketplace.call(sessions, {"user_id": seed["buyer_id"], "dataset_ids": basket}) for basket in baskets
+        ))
+
+        completed = [r for r in results if r.get("status") == "completed"]
+        state = await marketplace.state(sessions, seed["buyer_id"], seed["seller_id"])
+        marketplace.assert_consistent(state, buyer_start)
+        assert len(state["purchased"]) == sum(len(r["purchases"]) for r in completed)
+        assert state["spent"] == pytest.approx(sum(r["total_amount"] for r in completed))
+
+    asyncio.run(marketplace.run(scenario))
+
+
+def test_racing_purchases_and_checkouts_do_not_deadlock():
+    buyer_start = 80.0
+
+    async def scenario(sessions: async_sessionmaker):
+        seed = await marketplace.seed(sessions, buyer_start, dataset_count=60)
+        ids = seed["dataset_ids"]
+        # Single purchases and checkouts of the same buyer race on the same datasets;
+        # any deadlock would surface as an error result or an exception here
+        requests = []
+        for start, dataset_id in enumerate(ids):
+            requests.append({"user_id": seed["buyer_id"], "dataset_id": dataset_id})
+            requests.append({"user_id": seed["buyer_id"], "dataset_ids": [ids[(start + n) % len(ids)] for n in range(3)]})
+        results = await asyncio.gather(*(marketplace.call(sessions, request) for request in requests))
+
+        errors = {r["error"] for r in results if r.get("status") == "failed"}
+        assert errors <= {"Dataset already purchased", "Insufficient balance"}
+
+        completed = [r for r in results if r.get("status") == "completed"]
+        state = await marketplace.state(sessions, seed["buyer_id"], seed["seller_id"])
+        marketplace.assert_consistent(state, buyer_start)
+        assert len(state["purchased"]) == sum(len(r["purchases"]) if "purchases" in r else 1 for r in completed)
+
+    asyncio.run(marketplace.run(scenario))
+
+
+def test_concurrent_requests_with_one_idempotency_key_purchase_once():
+    buyer_start = 100.0
+
+    async def scenario(sessions: async_sessionmaker):
+        seed = await marketplace.seed(sessions, buyer_start, dataset_count=1)
+        request = {"user_id": seed["buyer_id"], "dataset_id": seed["dataset_ids"][0], "idempotency_key": "retry-1"}
+        results = await asyncio.gather(*(marketplace.call(sessions, request) for _ in range(50)))
+
+        assert all(r.get("status") == "completed" for r in results)
+        assert sum(1 for r in results if not r.get("replayed")) == 1
+
+        state = await marketplace.state(sessions, seed["buyer_id"], seed["seller_id"])
+        marketplace.assert_consistent(state, buyer_start)
+        assert len(state["purchased"]) == 1
+        async with sessions() as db:
+            keys = await db.scalar(select(func.count()).select_from(IdempotencyKey))
+        assert keys == 1
+
+    asyncio.run(marketplace.run(scenario))
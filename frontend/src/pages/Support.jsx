@@ -5,6 +5,7 @@ export default function Support() {
     const [query, setQuery] = useState('');
     const [messages, setMessages] = useState([]);
     const [loading, setLoading] = useState(false);
+    const [sessionId, setSessionId] = useState(null);
 
     const commonQuestions = [
         "How do I purchase a dataset?",
@@ -25,8 +26,12 @@ export default function Support() {
 
         try {
             const response = await axios.post('http://localhost:8000/api/support/query', {
-                query: query
+                query: query,
+                session_id: sessionId
             });
+            if (response.data.session_id) {
+                setSessionId(response.data.session_id);
+            }
 
             const agentMessage = {
                 type: 'agent',